@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+'''Converts many sites in one invocation, see option -b and run_batch().
+
+A manifest lists one site per line: its config file as given to option -c and optionally the directory the
+conversion runs in, i.e. all relative paths of the config refer to.  The directory defaults to the directory
+of the manifest.  Empty lines and comments # are ignored, e.g.:
+
+    # site            directory
+    config_mueller    sites/mueller
+    config_meier      sites/meier
+
+Disclaimer:
+
+   This file is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+'''
+
+import io
+import os
+import sys
+import time
+import traceback
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+
+from myargs import load_config
+from session import ConversionSession
+
+# one line of the manifest
+Site = namedtuple('Site', 'config_file directory')
+
+# result of one site, output is everything printed during its conversion
+SiteResult = namedtuple('SiteResult', 'site status seconds output')
+
+# GARecords read by this process, shared by all sites converted here, see ets.read_project()
+projects = {}
+
+
+def read_manifest(manifest):
+    '''Returns all Sites listed in manifest.  Script is terminated if the manifest can not be read.
+    '''
+    basedir = os.path.dirname(os.path.abspath(manifest))
+    sites = []
+    try:
+        with open(manifest, 'r') as infile:
+            for line in infile:
+                fields = line.split('#', 1)[0].split()
+                if not fields:
+                    continue
+                if len(fields) > 2:
+                    print(f"ERROR: config file and directory expected in {manifest}: {line.strip()}")
+                    sys.exit(1)
+                directory = os.path.join(basedir, fields[1] if len(fields) > 1 else '')
+                sites.append(Site(fields[0], os.path.normpath(directory)))
+    except OSError as err:
+        print(f"ERROR: {err}")
+        sys.exit(1)
+
+    return sites
+
+
+def convert_site(site):
+    '''Converts one site in its directory and returns SiteResult.
+
+    Compiled matchers and ETS projects read are kept by this process for the following sites.
+    '''
+    start = time.perf_counter()
+    cwd = os.getcwd()
+    output = io.StringIO()
+    status = 'ok'
+
+    with redirect_stdout(output):
+        try:
+            sys.path.insert(0, site.directory)
+            os.chdir(site.directory)
+
+            # config files of different sites may have the same name
+            sys.modules.pop(site.config_file, None)
+            ConversionSession(load_config(site.config_file), projects=projects).run()
+        except SystemExit as err:
+            status = f'failed (exit {err.code})'
+        except Exception as err:
+            traceback.print_exc(file=output)
+            status = f'failed ({type(err).__name__}: {err})'
+        finally:
+            sys.path.remove(site.directory)
+            os.chdir(cwd)
+
+    return SiteResult(site, status, time.perf_counter() - start, output.getvalue())
+
+
+def run_batch(manifest, jobs=1):
+    '''Converts all sites of manifest, jobs sites in parallel processes (0 for all cores).
+
+    The output of each site is printed once it is done, followed by a summary w/ time and status per site.
+    Returns number of failed sites.
+    '''
+    sites = read_manifest(manifest)
+    jobs = min(jobs or os.cpu_count(), len(sites)) or 1
+    start = time.perf_counter()
+
+    results = []
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for result in executor.map(convert_site, sites):
+                print_result(result)
+                results.append(result)
+    else:
+        for site in sites:
+            result = convert_site(site)
+            print_result(result)
+            results.append(result)
+
+    failed = [x for x in results if x.status != 'ok']
+
+    print(f"\n{'site':40} {'seconds':>8}  status")
+    for result in results:
+        print(f"{name(result.site):40} {result.seconds:8.2f}  {result.status}")
+    print(f"{len(results)} sites, {len(failed)} failed, {time.perf_counter() - start:.2f} seconds")
+
+    return len(failed)
+
+
+def name(site):
+    return f"{os.path.relpath(site.directory)}/{site.config_file}"
+
+
+def print_result(result):
+    print(f"==== {name(result.site)}")
+    print(result.output, end='')
+    print(f"==== {name(result.site)}: {result.status}, {result.seconds:.2f} seconds\n")
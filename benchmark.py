@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+'''Benchmarks the conversion w/ a generated ETS project and item files.
+
+Generates an ETS 4 or ETS 5 project file (0.xml) and matching knx1 item files at the given scale, times every
+step of ConversionSession.run() and records the peak memory.  The results are written as JSON and can be
+compared w/ a former run, e.g.:
+
+    ./benchmark.py --devices 3000 -o before.json
+    ... change something ...
+    ./benchmark.py --devices 3000 -o after.json --compare before.json
+
+Disclaimer:
+
+   This file is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+'''
+
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from types import SimpleNamespace
+
+from groupaddress import GroupAddress
+from myargs import load_config
+from session import ConversionSession
+
+try:
+    import resource
+except ImportError:     # Windows
+    resource = None
+
+NAMESPACES = {4: 'http://knx.org/xml/project/12', 5: 'http://knx.org/xml/project/14'}
+
+# ProductRefIds of generated devices, see ACTORS and CONTROLS in site_config()
+ACTORS = ('M-0083_H-AKS-0816.01', 'M-0083_H-AKD-0401.01', 'M-0083_H-JAL-0410.01')
+CONTROLS = ('M-00C8_H-TSM-4.01', 'M-0002_H-ZN1IO-4.01')
+OTHERS = ('M-0071_H-IPS-100.01',)
+
+
+def parse_args(argv=None):
+    parser = ArgumentParser(description='benchmark the conversion w/ a generated ETS project and item files')
+    parser.add_argument('--devices', type=int, default=500, help='number of devices (default: %(default)s)')
+    parser.add_argument('--gas', type=int, default=8,
+                        help='group addresses per device, each group address is linked to 2 devices on average '
+                             '(default: %(default)s)')
+    parser.add_argument('--buildings', type=int, default=2, help='number of buildings (default: %(default)s)')
+    parser.add_argument('--floors', type=int, default=3, help='floors per building (default: %(default)s)')
+    parser.add_argument('--trades', type=int, default=4, help='number of trades (default: %(default)s)')
+    parser.add_argument('--used', type=float, default=0.7,
+                        help='share of group addresses used in item files (default: %(default)s)')
+    parser.add_argument('--dimmers', type=float, default=0.15, help='share of Dimmer items (default: %(default)s)')
+    parser.add_argument('--rollershutters', type=float, default=0.1,
+                        help='share of Rollershutter items (default: %(default)s)')
+    parser.add_argument('--feedback', type=float, default=0.3,
+                        help='share of Switch items w/ feedback address (default: %(default)s)')
+    parser.add_argument('--items-files', type=int, default=4, help='number of item files (default: %(default)s)')
+    parser.add_argument('--ets', type=int, choices=sorted(NAMESPACES), default=5,
+                        help='ETS version of project file (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=1, help='random seed (default: %(default)s)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of processes reading project and item files, see convert-knx.py -j '
+                             '(default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of runs, the fastest time per step is reported (default: %(default)s)')
+    parser.add_argument('--dir', help='directory for generated and converted files (default: temporary)')
+    parser.add_argument('-o', '--output', help='write results to this JSON file')
+    parser.add_argument('--compare', metavar='JSON', help='compare w/ results of a former run')
+    return parser.parse_args(argv)
+
+
+def generate_project(filename, args):
+    '''Writes an ETS project file and returns its group addresses [(GroupAddress, name), ...].
+
+    Each device is linked to args.gas random group addresses, devices are spread over buildings/floors and
+    trades.  Some devices are found in more than one part as in real projects.
+    '''
+    rnd = random.Random(args.seed)
+    project = 'P-0B0E'
+    count = min(max(1, args.devices * args.gas // 2), 0xffff)
+    gas = [(GroupAddress(x), f'GA {x}') for x in range(1, count + 1)]
+    products = ACTORS * 3 + CONTROLS * 3 + OTHERS
+
+    out = []
+    w = out.append
+    w('<?xml version="1.0" encoding="utf-8"?>')
+    w(f'<KNX xmlns="{NAMESPACES[args.ets]}" CreatedBy="ETS{args.ets}" ToolVersion="{args.ets}.0.0">')
+    w(f'  <Project Id="{project}">')
+    w('    <Installations>')
+    w('      <Installation Name="" BCUKey="4294967295" DefaultLanguage="de-DE">')
+    w('        <Topology>')
+    devices = []
+    for line in range(0, args.devices, 255):
+        w(f'          <Area Id="{project}-0_A-{line // 255 // 16 + 1}" Address="{line // 255 // 16 + 1}">')
+        w(f'            <Line Id="{project}-0_L-{line // 255 + 1}" Address="{line // 255 % 16 + 1}">')
+        for device in range(line, min(line + 255, args.devices)):
+            id = f'{project}-0_DI-{device + 1}'
+            devices.append(id)
+            w(f'              <DeviceInstance Id="{id}" Name="" ProductRefId="{rnd.choice(products)}" '
+              f'Address="{device % 255 + 1}">')
+            w('                <ComObjectInstanceRefs>')
+            for number, ga in enumerate(rnd.sample(range(len(gas)), min(args.gas, len(gas)))):
+                # some com objects w/o datapoint type, these are skipped by the conversion
+                dpt = '' if number % 7 == 6 else ' DatapointType="DPST-1-1"'
+                w(f'                  <ComObjectInstanceRef RefId="O-{number}_R-{number + 1}"{dpt}>')
+                w('                    <Connectors>')
+                w(f'                      <{"Send" if number % 2 else "Receive"} '
+                  f'GroupAddressRefId="{project}-0_GA-{ga + 1}" />')
+                w('                    </Connectors>')
+                w('                  </ComObjectInstanceRef>')
+            w('                </ComObjectInstanceRefs>')
+            w('              </DeviceInstance>')
+        w('            </Line>')
+        w('          </Area>')
+    w('        </Topology>')
+
+    w('        <Buildings>')
+    parts = max(1, args.buildings * args.floors)
+    for building in range(args.buildings):
+        w(f'          <BuildingPart Id="{project}-0_BP-{building + 1}" Name="Building {building + 1}" '
+          f'Type="Building">')
+        for floor in range(args.floors):
+            part = building * args.floors + floor
+            w(f'            <BuildingPart Id="{project}-0_BP-{building + 1}-{floor}" Name="Floor {floor}" '
+              f'Type="Floor">')
+            for device in devices[part::parts]:
+                w(f'              <DeviceInstanceRef RefId="{device}" />')
+            w('            </BuildingPart>')
+        w('          </BuildingPart>')
+    w('        </Buildings>')
+
+    w('        <Trades>')
+    for trade in range(args.trades):
+        w(f'          <Trade Id="{project}-0_T-{trade + 1}" Name="Trade {trade + 1}">')
+        for device in devices[trade::max(1, args.trades) * 2]:
+            w(f'            <DeviceInstanceRef RefId="{device}" />')
+        w('          </Trade>')
+    w('        </Trades>')
+
+    w('        <GroupAddresses>')
+    w('          <GroupRanges>')
+    w(f'            <GroupRange Id="{project}-0_GR-1" RangeStart="1" RangeEnd="65535" Name="All">')
+    for number, (ga, name) in enumerate(gas):
+        w(f'              <GroupAddress Id="{project}-0_GA-{number + 1}" Address="{int(ga)}" Name="{name}" />')
+    w('            </GroupRange>')
+    w('          </GroupRanges>')
+    w('        </GroupAddresses>')
+    w('      </Installation>')
+    w('    </Installations>')
+    w('  </Project>')
+    w('</KNX>')
+
+    with open(filename, 'w', encoding='utf8') as outfile:
+        outfile.write('\n'.join(out) + '\n')
+
+    return gas
+
+
+def generate_items(directory, gas, args):
+    '''Writes knx1 item files using args.used of group addresses and returns their file names.
+    '''
+    rnd = random.Random(args.seed)
+    used = rnd.sample(gas, int(len(gas) * args.used))
+    files = [[] for x in range(max(1, args.items_files))]
+
+    number = 0
+    while used:
+        lines = files[number % len(files)]
+        if number % 25 == 0:
+            lines.append('// comment and other non knx lines\n')
+            lines.append('Group gAll\n')
+
+        kind = rnd.random()
+        if kind < args.dimmers and len(used) >= 3:
+            (s, x), (i, x), (p, x) = used.pop(), used.pop(), used.pop()
+            lines.append(f'Dimmer Dimmer_{number} "Dimmer {number} [%d %%]" (gAll) '
+                         f'{{ knx="{s}, {i}, 5.001:{p}" }}\n')
+        elif kind < args.dimmers + args.rollershutters and len(used) >= 3:
+            (u, x), (s, x), (p, x) = used.pop(), used.pop(), used.pop()
+            lines.append(f'Rollershutter Rollershutter_{number} "Rollershutter {number}" '
+                         f'{{ knx="{u}, {s}, {p}", autoupdate="false" }}\n')
+        elif kind < args.dimmers + args.rollershutters + args.feedback and len(used) >= 2:
+            (s, x), (f, x) = used.pop(), used.pop()
+            lines.append(f'Switch Switch_{number} "Switch {number}" (gAll) {{ knx="1.001:{s}+<{f}" }}\n')
+        else:
+            ga, name = used.pop()
+            lines.append(rnd.choice((f'Switch Light_{number} "{name}" {{ knx="{ga}" }}\n',
+                                     f'Number Temperature_{number} "{name} [%.1f]" '
+                                     f'{{ knx="<9.001:{ga}", expire="1h,state=0" }}\n',
+                                     f'Contact Window_{number} "{name}" {{ knx="<1.019:{ga}" }} // comment\n')))
+        number += 1
+
+    names = []
+    for number, lines in enumerate(files):
+        filename = os.path.join(directory, f'generated{number}.items')
+        with open(filename, 'w', encoding='utf8') as outfile:
+            outfile.writelines(lines)
+        names.append(filename)
+
+    return names
+
+
+def site_config(directory, projectfile, items_files):
+    '''Returns config based on config.py, reading the generated files and writing to directory.
+    '''
+    config = SimpleNamespace(**{x: y for x, y in vars(load_config('config')).items() if not x.startswith('__')})
+    config.PROJECTFILES = projectfile
+    config.ITEMS_FILES = ', '.join(items_files)
+    config.ITEM_RESULT_DIR = os.path.join(directory, 'result', 'items')
+    config.THINGS_FILE = os.path.join(directory, 'result', 'things', 'knx.things')
+    config.THINGS_UNUSED_FILE = os.path.join(directory, 'unused.things')
+    config.ITEMS_UNUSED_FILE = os.path.join(directory, 'unused.items')
+    config.ITEMS_UNUSED_CONTROLS_FILE = os.path.join(directory, 'unused-control.items')
+    config.DEBUG_KNX = os.path.join(directory, 'knx.txt')
+    config.DEBUG_OH = os.path.join(directory, 'oh.txt')
+    config.ETS_CACHE_DIR = None
+    config.ACTORS = 'AKS, AKD, JAL'
+    config.CONTROLS = 'TSM, ZN1IO'
+    config.IGNORE_DEVICES = None
+    return config
+
+
+def run_steps(config, directory, jobs=1, memory=False):
+    '''Converts once and returns {step: seconds} or {step: peak bytes allocated} if memory.
+    '''
+    shutil.rmtree(os.path.join(directory, 'result'), ignore_errors=True)
+    for name in ('unused.things', 'unused.items', 'unused-control.items', 'knx.txt', 'oh.txt'):
+        if os.path.exists(os.path.join(directory, name)):
+            os.remove(os.path.join(directory, name))
+
+    results = {}
+    output = io.StringIO()
+    try:
+        with redirect_stdout(output):
+            session = ConversionSession(config, jobs=jobs)
+            for step in ConversionSession.STEPS:
+                if memory:
+                    tracemalloc.start()
+                    getattr(session, step)()
+                    results[step] = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                else:
+                    start = time.perf_counter()
+                    getattr(session, step)()
+                    results[step] = time.perf_counter() - start
+    except SystemExit:
+        print(output.getvalue())
+        raise
+
+    results['counts'] = {'knx_items': len(session.knx), 'oh_items': len(session.oh)}
+    return results
+
+
+def benchmark(args):
+    '''Returns results as dict, see module doc.
+    '''
+    directory = args.dir or tempfile.mkdtemp(prefix='knx-benchmark-')
+    os.makedirs(directory, exist_ok=True)
+    projectfile = os.path.join(directory, '0.xml')
+
+    start = time.perf_counter()
+    gas = generate_project(projectfile, args)
+    items_files = generate_items(directory, gas, args)
+    generated = time.perf_counter() - start
+
+    config = site_config(directory, projectfile, items_files)
+
+    times = [run_steps(config, directory, args.jobs) for x in range(max(1, args.repeat))]
+    memory = run_steps(config, directory, args.jobs, memory=True)
+
+    steps = {}
+    for step in ConversionSession.STEPS:
+        steps[step] = {'seconds': min(x[step] for x in times),
+                       'all_seconds': [x[step] for x in times],
+                       'peak_kb': memory[step] // 1024}
+
+    results = {
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {x: y for x, y in vars(args).items() if x not in ('dir', 'output', 'compare')},
+        'projectfile_kb': os.path.getsize(projectfile) // 1024,
+        'generate_seconds': generated,
+        'counts': times[0]['counts'],
+        'steps': steps,
+        'total_seconds': sum(x['seconds'] for x in steps.values()),
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None,
+    }
+
+    if not args.dir:
+        shutil.rmtree(directory)
+
+    return results
+
+
+def print_results(results, former=None):
+    print(f"project file {results['projectfile_kb']} kB, {results['counts']['knx_items']} KNX items, "
+          f"{results['counts']['oh_items']} OH items")
+    print(f"{'step':26} {'seconds':>9} {'peak kB':>9}" + (f" {'former':>9} {'ratio':>6}" if former else ''))
+    for step, result in results['steps'].items():
+        line = f"{step:26} {result['seconds']:9.3f} {result['peak_kb']:9}"
+        if former and step in former['steps']:
+            old = former['steps'][step]['seconds']
+            line += f" {old:9.3f} {result['seconds'] / old if old else 0:6.2f}"
+        print(line)
+    line = f"{'total':26} {results['total_seconds']:9.3f} {'':9}"
+    if former:
+        line += f" {former['total_seconds']:9.3f} {results['total_seconds'] / former['total_seconds']:6.2f}"
+    print(line)
+    if results['max_rss_kb']:
+        print(f"max. resident memory {results['max_rss_kb']} kB")
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    former = None
+    if args.compare:
+        with open(args.compare, 'r') as infile:
+            former = json.load(infile)
+        if former['parameters'] != {x: y for x, y in vars(args).items() if x not in ('dir', 'output', 'compare')}:
+            print(f"WARNING: {args.compare} was run w/ other parameters: {former['parameters']}")
+
+    results = benchmark(args)
+    print_results(results, former)
+
+    if args.output:
+        with open(args.output, 'w') as outfile:
+            json.dump(results, outfile, indent=2)
+        print(f"written: {args.output}")
+
+    sys.exit(0)
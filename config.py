@@ -24,13 +24,27 @@ ITEMS_UNUSED_CONTROLS_FILE = "unused-control.items"
 DEBUG_KNX = "knx.txt"
 DEBUG_OH = "oh.txt"
 
-# knxproj files (optional), unzip your knxproj file
+# knxproj files (optional), either the knxproj file itself or its unzipped 0.xml
 # comment out this lines if you do not have/want to read ETS config
 # multiple files can be read, separated by spaces
 PROJECTFILES = "./knxproj/P-02A7/0.xml"
 
+# ETS project files are read element by element to keep memory low.
+# Set to False to read the whole file into memory at once (old behaviour).
+# ETS_STREAMING = True
+
+# If defined, the content read from PROJECTFILES is cached in this directory and
+# only read again if a project file or the ETS settings below change.
+# ETS_CACHE_DIR = r"./cache/"
+
+# If defined, the items read from PROJECTFILES are kept in this SQLite database
+# instead of memory, for very large projects.  The file is replaced on each run,
+# ":memory:" keeps the database in memory.
+# ITEM_STORE = r"./items.db"
+
 # ## specify device types by vendor name (must be part of the *ProductRefId*)
 # If unsure: run the script and look into the DEBUG_KNX file
+# You may use regex to match, e.g. "M-0083_H-AK[SD]".
 
 # These are the primary addresses which will be used for read/write
 ACTORS = "AKS, AKD, JAL, M-0051_H-hp, QUAD,"
@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+'''Reads group addresses and devices from ETS project files (knxproj or 0.xml)
+
+Disclaimer:
+
+   This file is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+'''
+
+import hashlib
+import os
+import pickle
+import re
+import sys
+import zipfile
+import xml.etree.ElementTree as ET
+from collections import Counter, namedtuple
+from types import SimpleNamespace
+
+from groupaddress import GroupAddress
+
+# one entry per group address connected to a device, see KNXItem
+GARecord = namedtuple('GARecord', 'name address refid device_address device_id building')
+
+# installation file(s) within a knxproj archive, e.g. P-02A7/0.xml
+PROJECT_XML = re.compile(r'^P-[0-9A-Fa-f]+/[0-9]+\.xml$')
+PROJECT_ZIP = re.compile(r'^P-[0-9A-Fa-f]+\.zip$')
+# installation file(s) within a project zip file, e.g. 0.xml of P-02A7.zip
+INNER_XML = re.compile(r'^[0-9]+\.xml$')
+
+# config variables the GARecords depend on, a change invalidates the cache (see config.ETS_CACHE_DIR)
+CACHE_CONFIG = ('ETS_LINE_PREFIX', 'FIND_BUILDINGS', 'FIND_BUILDINGPART', 'FIND_TRADES', 'FIND_TRADEPART',
+                'FIND_DEVICEREF', 'FIND_DEVICE', 'FIND_COMREF', 'FIND_CONNECTOR', 'FIND_SEND', 'FIND_RECEIVE',
+                'FIND_GA')
+CACHE_VERSION = b'2'
+
+# all config variables used here, see settings()
+SETTINGS = CACHE_CONFIG + ('ETS_STREAMING', 'ETS_CACHE_DIR')
+
+
+def settings(config):
+    '''Returns the config variables used for reading ETS files as picklable object for worker processes.
+
+    Variables not defined in config are not defined in the result either.
+    '''
+    return SimpleNamespace(**{x: getattr(config, x) for x in SETTINGS if hasattr(config, x)})
+
+
+def ga2str(ga):
+    # Converts ETS stlye group address to openhab format: 0/0/0.
+    return str(GroupAddress(ga))
+
+
+def get_root_tag(root):
+    '''Checks for KNX tag in root node.  Script is terminated if not found.
+    '''
+    if not root.tag.endswith('KNX'):
+        print(f'ERROR: no KNX root found in: {root}')
+        sys.exit(1)
+
+    return './/' + root.tag[:-3]    # .//{http://knx.org/xml/project/11}
+
+
+def read_parts(type, index, part, name=''):
+    '''Recursively reads all parts from ETS root.
+    '''
+    # print(f"reading {part.attrib['Name']}")
+    name = (name + " " + part.attrib['Name']).lstrip()
+
+    # find all devices in building, devices already read via another part are skipped
+    for devref in part.findall(index['tag'] + index['config'].FIND_DEVICEREF):
+        if devref.attrib['RefId'] not in index['visited']:
+            index['visited'].add(devref.attrib['RefId'])
+            yield from read_device(index, devref.attrib['RefId'], name)
+
+    # apply for all building sub-parts
+    for subpart in part.findall(type):
+        yield from read_parts(type, index, subpart, name)
+
+
+def read_device(index, ref, building):
+    ''' Reads top level ref device and all containing group addresses from ETS root.
+    '''
+    tag = index['tag']
+    config = index['config']
+    device = index['devices'][ref]
+
+    for comobj in device.findall(tag + config.FIND_COMREF):
+        if 'DatapointType' not in comobj.attrib.keys():
+            continue
+
+        # dpt = comobj.attrib['DatapointType']  # FIXME: need some mapping here to dtps
+
+        for connector in comobj.findall(tag + config.FIND_CONNECTOR):
+
+            for send in (connector.findall(tag + config.FIND_SEND) +
+                         connector.findall(tag + config.FIND_RECEIVE)):
+
+                if 'GroupAddressRefId' in send.keys():
+                    ga_ref = send.attrib['GroupAddressRefId']
+                    ga = index['gas'][ga_ref]
+                    ga_str = ga2str(int(ga.attrib['Address']))
+
+                    if len(ga_str) > 0:
+                        yield GARecord(name=ga.attrib['Name'],
+                                       address=ga_str,
+                                       refid=ga_ref,
+                                       device_address=sys.intern(f"{config.ETS_LINE_PREFIX}{device.attrib['Address']}"),
+                                       device_id=device.attrib['ProductRefId'],
+                                       # dpt=dpt,
+                                       building=building)
+
+
+def index_ets(root, config):
+    '''Reads all DeviceInstances and GroupAddresses from ETS root once and returns them by Id.
+    '''
+    tag = get_root_tag(root)
+    index = {'tag': tag, 'config': config, 'devices': {}, 'gas': {}, 'visited': set()}
+
+    for device in root.iterfind(tag + config.FIND_DEVICE):
+        index['devices'].setdefault(device.attrib['Id'], device)
+
+    for ga in root.iterfind(tag + config.FIND_GA):
+        index['gas'].setdefault(ga.attrib['Id'], ga)
+
+    return index
+
+
+def read_project_dom(projectfile, config, stats=None):
+    '''Reads the whole ETS project file into memory and returns all GARecords.
+
+    If Counter stats is given, the number of xml elements and devices read are added there.
+    '''
+    root = ET.parse(projectfile).getroot()
+    index = index_ets(root, config)
+    records = []
+
+    buildings = root.find(index['tag'] + config.FIND_BUILDINGS)
+    if buildings is None:
+        print("Buildings not found")
+    else:
+        for part in buildings:
+            records.extend(read_parts(config.FIND_BUILDINGPART, index, part))
+
+    trades = root.find(index['tag'] + config.FIND_TRADES)
+    if trades is not None:
+        for part in trades:
+            records.extend(read_parts(config.FIND_TRADEPART, index, part))
+
+    if stats is not None:
+        stats['xml_elements'] += sum(1 for x in root.iter())
+        stats['devices_expanded'] += len(index['visited'])
+
+    return records
+
+
+def read_project_stream(projectfile, config, stats=None):
+    '''Reads the ETS project file element by element and returns all GARecords.
+
+    Only the data needed for the KNXItems is kept: per DeviceInstance its group address references, per
+    building/trade part its DeviceInstanceRefs and per GroupAddress its address and name.  All other
+    elements are dropped as soon as they are complete, so memory does not grow with the size of the xml.
+    Strings repeated in many records, e.g. device_id or building, are shared by all of them.  If Counter stats is
+    given, the number of xml elements and devices read are added there.
+    '''
+    devices = {}      # Id: (Address, ProductRefId, [GroupAddressRefId, ...])
+    gas = {}          # Id: (address, Name)
+    parts = {config.FIND_BUILDINGS: None, config.FIND_TRADES: None}  # [(part name, RefId), ...]
+
+    tag = None
+    stack = []
+    top = None        # Buildings/Trades element currently read
+    name = None       # name of current top level building/trade part
+    device = 0        # > 0 while inside a DeviceInstance
+    elements = 0
+
+    for event, elem in ET.iterparse(projectfile, events=('start', 'end')):
+        if event == 'start':
+            if tag is None:
+                tag = get_root_tag(elem)[3:]
+            elif elem.tag == tag + config.FIND_DEVICE or device:
+                device += 1
+            elif top is None and elem.tag in (tag + config.FIND_BUILDINGS, tag + config.FIND_TRADES) \
+                    and parts[elem.tag[len(tag):]] is None:
+                top = elem
+                parts[elem.tag[len(tag):]] = []
+            elif top is not None and stack[-1] is top:
+                name = elem.attrib['Name']
+            stack.append(elem)
+            continue
+
+        stack.pop()
+        elements += 1
+
+        if device:
+            device -= 1
+            if device:
+                continue    # keep sub-elements until the device is complete
+            devices.setdefault(elem.attrib['Id'], read_device_refs(tag, elem, config))
+
+        elif elem.tag == tag + config.FIND_GA:
+            gas.setdefault(elem.attrib['Id'], (ga2str(int(elem.attrib['Address'])), elem.attrib['Name']))
+
+        elif elem.tag == tag + config.FIND_DEVICEREF and top is not None:
+            parts[top.tag[len(tag):]].append((name, elem.attrib['RefId']))
+
+        elif elem is top:
+            top = None
+
+        # drop finished element
+        elem.clear()
+        if stack:
+            stack[-1].remove(elem)
+
+    records = []
+
+    if parts[config.FIND_BUILDINGS] is None:
+        print("Buildings not found")
+
+    # each device is read once, via the 1st building or trade it is found in
+    visited = set()
+    for refs in (parts[config.FIND_BUILDINGS], parts[config.FIND_TRADES]):
+        for building, ref in refs or []:
+            if ref in visited:
+                continue
+            visited.add(ref)
+
+            address, device_id, ga_refs = devices[ref]
+            device_address = sys.intern(f"{config.ETS_LINE_PREFIX}{address}")
+            for ga_ref in ga_refs:
+                ga_address, ga_name = gas[ga_ref]
+                records.append(GARecord(name=ga_name,
+                                        address=ga_address,
+                                        refid=ga_ref,
+                                        device_address=device_address,
+                                        device_id=device_id,
+                                        building=building))
+
+    if stats is not None:
+        stats['xml_elements'] += elements
+        stats['devices_expanded'] += len(visited)
+
+    return records
+
+
+def read_device_refs(tag, device, config):
+    '''Returns address, product and all connected group address references of a DeviceInstance element.
+    '''
+    ga_refs = []
+    for comobj in device.iterfind('.//' + tag + config.FIND_COMREF):
+        if 'DatapointType' not in comobj.attrib.keys():
+            continue
+
+        for connector in comobj.iterfind('.//' + tag + config.FIND_CONNECTOR):
+            for send in (connector.findall('.//' + tag + config.FIND_SEND) +
+                         connector.findall('.//' + tag + config.FIND_RECEIVE)):
+                if 'GroupAddressRefId' in send.keys():
+                    ga_refs.append(sys.intern(send.attrib['GroupAddressRefId']))
+
+    return device.attrib['Address'], device.attrib['ProductRefId'], ga_refs
+
+
+def archive_files(archive, projectfile, pattern=PROJECT_XML):
+    '''Yields all installation xml files of a knxproj archive as open file objects.
+
+    Nothing is extracted to disk, the members are decompressed while they are read.
+    '''
+    members = [x for x in archive.infolist() if pattern.match(x.filename)]
+
+    for member in members:
+        if member.flag_bits & 0x1:
+            print(f"ERROR: {member.filename} in {projectfile} is encrypted, "
+                  "password protected projects are not supported, export the project w/o password")
+            sys.exit(1)
+
+    for member in members:
+        try:
+            xmlfile = archive.open(member)
+        except (RuntimeError, NotImplementedError) as err:
+            print(f"ERROR: {member.filename} in {projectfile} can not be read: {err}")
+            sys.exit(1)
+        with xmlfile:
+            yield xmlfile
+
+    if members:
+        return
+
+    # project may be packed into another zip file within the archive, w/ the installation files at its root
+    inner_zips = [x for x in archive.namelist() if PROJECT_ZIP.match(x)] if pattern is PROJECT_XML else []
+    for name in inner_zips:
+        try:
+            inner = zipfile.ZipFile(archive.open(name))
+        except (zipfile.BadZipFile, RuntimeError, NotImplementedError) as err:
+            print(f"ERROR: {name} in {projectfile} can not be read: {err}")
+            sys.exit(1)
+        with inner:
+            yield from archive_files(inner, f"{projectfile}/{name}", INNER_XML)
+        return
+
+    print(f"ERROR: no project found in: {projectfile}")
+    sys.exit(1)
+
+
+def project_files(projectfile):
+    '''Yields the installation xml(s) of an ETS project: either a 0.xml file or read from a knxproj archive.
+    '''
+    if not zipfile.is_zipfile(projectfile):
+        yield projectfile
+        return
+
+    with zipfile.ZipFile(projectfile) as archive:
+        yield from archive_files(archive, projectfile)
+
+
+def cache_key(projectfile, config):
+    '''Returns hash of the project file content and all config variables used for reading it.
+    '''
+    key = hashlib.sha256(CACHE_VERSION)
+    for name in CACHE_CONFIG:
+        key.update(repr(getattr(config, name, None)).encode())
+
+    with open(projectfile, 'rb') as infile:
+        for chunk in iter(lambda: infile.read(1 << 20), b''):
+            key.update(chunk)
+
+    return key.hexdigest()
+
+
+def read_cache(cachefile):
+    '''Returns cached GARecords or None if not cached (yet).
+    '''
+    try:
+        with open(cachefile, 'rb') as infile:
+            return pickle.load(infile)
+    except FileNotFoundError:
+        return None
+    except (pickle.UnpicklingError, EOFError, AttributeError, ImportError, ValueError) as err:
+        print(f"WARNING: ignoring broken cache file {cachefile}: {err}")
+        return None
+
+
+def write_cache(cachefile, records):
+    '''Stores GARecords, the file is replaced atomically so a concurrent reader never sees a partial file.
+    '''
+    os.makedirs(os.path.dirname(cachefile), exist_ok=True)
+    tmpfile = f"{cachefile}.{os.getpid()}.tmp"
+    with open(tmpfile, 'wb') as outfile:
+        pickle.dump(records, outfile, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmpfile, cachefile)
+
+
+def read_project(projectfile, config, projects=None, stats=None):
+    '''Returns all GARecords of an ETS project file or knxproj archive, see config.ETS_STREAMING.
+
+    config is the config module or settings(config).  If config.ETS_CACHE_DIR is defined the records are cached
+    there and read from cache as long as neither the project file nor the relevant config changes.  If dict
+    projects is given the records are kept there as well, so the same project is read only once per process.
+    If stats is given, e.g. a Counter, the number of projects, xml elements, devices and records read are added.
+    '''
+    if stats is None:
+        stats = Counter()
+
+    try:
+        streaming = config.ETS_STREAMING
+    except (NameError, AttributeError):
+        streaming = True
+
+    try:
+        cachedir = config.ETS_CACHE_DIR
+    except (NameError, AttributeError):
+        cachedir = None
+
+    key = None
+    if cachedir is not None or projects is not None:
+        key = cache_key(projectfile, config)
+
+    if projects is not None and key in projects:
+        print(f"using {projectfile} read before")
+        stats['projects_cached'] += 1
+        return projects[key]
+
+    cachefile = None
+    if cachedir is not None:
+        cachefile = os.path.join(cachedir, key + '.pickle')
+
+        records = read_cache(cachefile)
+        if records is not None:
+            print(f"using cache {cachefile}")
+            stats['projects_cached'] += 1
+            if projects is not None:
+                projects[key] = records
+            return records
+
+    records = []
+    for xmlfile in project_files(projectfile):
+        if streaming:
+            records.extend(read_project_stream(xmlfile, config, stats))
+        else:
+            records.extend(read_project_dom(xmlfile, config, stats))
+    stats['projects_read'] += 1
+    stats['ga_records'] += len(records)
+
+    if cachefile is not None:
+        write_cache(cachefile, records)
+    if projects is not None:
+        projects[key] = records
+
+    return records
+
+
+def read_project_counted(projectfile, config):
+    '''Returns tuple ([GARecord, ...], Counter) for worker processes, see read_project().
+    '''
+    stats = Counter()
+    return read_project(projectfile, config, stats=stats), stats
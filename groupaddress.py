@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+'''Provides for KNX group addresses
+
+Disclaimer:
+
+   This file is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+'''
+
+
+class GroupAddress(int):
+    '''KNX group address backed by its raw 16 bit ETS value.
+
+    str() gives the 3-level openHAB form main/middle/sub.  There is only one instance per value, so the
+    string is formatted once and comparing, hashing and sorting are plain int operations.
+    '''
+    all_values = {}    # raw value: GroupAddress
+    all_strings = {}   # "main/middle/sub": GroupAddress
+
+    def __new__(cls, value):
+        ga = cls.all_values.get(value)
+        if ga is None:
+            if not 0 <= value <= 0xffff:
+                raise ValueError(f"invalid group address: {value}")
+            ga = super().__new__(cls, value)
+            ga.text = "%d/%d/%d" % (ga.main, ga.middle, ga.sub)
+            ga = cls.all_values.setdefault(value, ga)
+        return ga
+
+    @classmethod
+    def parse(cls, address):
+        '''Returns GroupAddress of 3-level string main/middle/sub.
+        '''
+        ga = cls.all_strings.get(address)
+        if ga is None:
+            try:
+                main, middle, sub = map(int, address.split('/'))
+            except ValueError:
+                raise ValueError(f"invalid group address: {address}") from None
+            if not (0 <= main <= 0x1f and 0 <= middle <= 0x7 and 0 <= sub <= 0xff):
+                raise ValueError(f"invalid group address: {address}")
+            ga = cls.all_strings.setdefault(address, cls((main << 11) | (middle << 8) | sub))
+        return ga
+
+    @property
+    def main(self):
+        return (self >> 11) & 0x1f
+
+    @property
+    def middle(self):
+        return (self >> 8) & 0x7
+
+    @property
+    def sub(self):
+        return self & 0xff
+
+    @property
+    def sort_index(self):
+        '''Sortable number as used for the output files.
+        '''
+        return self.main * 1000 + self.middle * 100 + self.sub * 10
+
+    def __str__(self):
+        return self.text
+
+    def __format__(self, format_spec):
+        return format(self.text, format_spec)
+
+    def __repr__(self):
+        return f"GroupAddress('{self.text}')"
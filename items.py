@@ -10,43 +10,167 @@ Disclaimer:
 
 import sys
 import re
-from dataclasses import dataclass, field
-from abc import ABCMeta, abstractmethod
+from dataclasses import InitVar, dataclass, field, fields
+from operator import attrgetter
 
-from myargs import config
+from groupaddress import GroupAddress
+from knx1 import KNX1Line, KNX1SyntaxError, parse_line
 
+# binding block of an item line
+BINDING = re.compile(r'{.*}')
 
+
+class DeviceMatcher:
+    '''Classifies KNX devices by their device_id (ProductRefId) as configured in ACTORS, CONTROLS and IGNORE_DEVICES.
+
+    Each list is compiled once into one regular expression, each device_id is classified only once.  Use get() to
+    share one matcher by all configs w/ the same lists.
+    '''
+    LISTS = ('ACTORS', 'CONTROLS', 'IGNORE_DEVICES')
+    shared = {}    # values of LISTS: DeviceMatcher
+
+    def __init__(self, config):
+        self.patterns = {}
+        self.regex = {}
+        for name in DeviceMatcher.LISTS:
+            try:
+                self.patterns[name] = [x for x in getattr(config, name).replace(" ", "").split(",") if x != ""]
+            except (NameError, AttributeError):
+                self.patterns[name] = []
+            if self.patterns[name]:
+                self.regex[name] = re.compile('|'.join(f'(?:{x})' for x in self.patterns[name]))
+        self.cache = {}
+        self.evaluations = 0    # device_ids classified by regex, i.e. not cached
+
+    @classmethod
+    def get(cls, config):
+        '''Returns matcher for the lists of config, compiled only once per process.
+        '''
+        key = tuple(getattr(config, x, None) for x in cls.LISTS)
+        matcher = cls.shared.get(key)
+        if matcher is None:
+            matcher = cls.shared.setdefault(key, cls(config))
+        return matcher
+
+    def classify(self, device_id):
+        '''Returns tuple (actor, control, ignored) for given device_id.
+        '''
+        result = self.cache.get(device_id)
+        if result is None:
+            result = tuple(name in self.regex and self.regex[name].search(device_id) is not None
+                           for name in DeviceMatcher.LISTS)
+            self.cache[device_id] = result
+            self.evaluations += 1
+        return result
+
+    def is_actor(self, device_id):
+        return self.classify(device_id)[0]
+
+    def is_control(self, device_id):
+        return self.classify(device_id)[1]
+
+    def is_ignored(self, device_id):
+        return self.classify(device_id)[2]
+
+    def is_known(self, device_id):
+        actor, control, ignored = self.classify(device_id)
+        return actor or control
+
+    def explain(self, device_id, name):
+        '''Prints 1st pattern of list name matching device_id.
+        '''
+        for pattern in self.patterns[name]:
+            if re.search(pattern, device_id):
+                print(f"{pattern} in {device_id} matches")
+                return
+
+
+class NameMatcher:
+    '''Matches item names against a config list of regular expressions, e.g. WANTED_CONTROLS.
+
+    The list is compiled once into one regular expression, each name is matched only once.  Use get() to share
+    one matcher by all configs w/ the same list.
+    '''
+    shared = {}    # list: NameMatcher
+
+    def __init__(self, config, name):
+        try:
+            patterns = getattr(config, name).replace(" ", "").split(",")
+            self.regex = re.compile('|'.join(f'(?:{x})' for x in patterns))
+        except (NameError, AttributeError):
+            self.regex = None
+        self.cache = {}
+        self.evaluations = 0    # names matched by regex, i.e. not cached
+
+    @classmethod
+    def get(cls, config, name):
+        '''Returns matcher for list name of config, compiled only once per process.
+        '''
+        key = getattr(config, name, None)
+        matcher = cls.shared.get(key)
+        if matcher is None:
+            matcher = cls.shared.setdefault(key, cls(config, name))
+        return matcher
+
+    def match(self, name):
+        '''Returns True if the beginning of name matches any of the patterns.
+        '''
+        result = self.cache.get(name)
+        if result is None:
+            result = self.regex is not None and self.regex.match(name) is not None
+            self.cache[name] = result
+            self.evaluations += 1
+        return result
+
+
+def slotted(cls):
+    '''Returns a copy of dataclass cls w/ __slots__ for its fields, so instances do not carry a __dict__.
+
+    Needed as long as we support python < 3.10 (dataclass(slots=True)).  Do not use super() w/o arguments
+    in slotted classes, it refers to the original class.
+    '''
+    inherited = {x for base in cls.__mro__[1:] for x in getattr(base, '__slots__', ())}
+    names = [x.name for x in fields(cls) if x.name not in inherited]
+
+    cls_dict = dict(cls.__dict__)
+    cls_dict['__slots__'] = tuple(names)
+    for name in names:
+        cls_dict.pop(name, None)    # defaults are kept by the generated __init__
+    cls_dict.pop('__dict__', None)
+    cls_dict.pop('__weakref__', None)
+
+    return type(cls)(cls.__name__, cls.__bases__, cls_dict)
+
+
+@slotted
 @dataclass(order=True)
-class Item(metaclass=ABCMeta):
+class Item:
     '''Helper super-class for storing common data per Item
     '''
     sort_index: int = field(init=False, repr=False)
     name: str = ''
     address: str = ''
+    ga: GroupAddress = field(init=False, repr=False, compare=False)    # address as int
+    session: object = field(default=None, repr=False, compare=False)  # ConversionSession the item belongs to
 
-    # all_items = [] must be declared in subclass
-    @property
-    @abstractmethod
-    def all_items(self):
-        pass
+    sort_keys = {}    # class: attrgetter of the fields compared by the dataclass ordering
 
-    @classmethod
-    def items(cls):
-        return cls.all_items
+    def sort_key(self):
+        '''Returns the values compared by the dataclass ordering, for sorted(..., key=Item.sort_key).
 
-    @classmethod
-    def remove(cls, item):
-        cls.items().remove(item)
+        The key is built once per item instead of once per comparison.
+        '''
+        getter = Item.sort_keys.get(type(self))
+        if getter is None:
+            getter = Item.sort_keys[type(self)] = attrgetter(*[x.name for x in fields(self) if x.compare])
+        return getter(self)
 
 
+@slotted
 @dataclass(order=True)
 class OpenHABItem(Item):
     '''Helper class for storing relevant data per OH Item
     '''
-    all_items = []
-    autoupdateTrue = None
-    autoupdateFalse = None
-
     line: str = ''
     type: str = None
     dpt: str = None
@@ -55,6 +179,7 @@ class OpenHABItem(Item):
     autoupdate: str = ""
     groupaddress_oh1: str = None
     groupaddress_oh2: str = None
+    tokens: InitVar[KNX1Line] = None    # line parsed already, see knx1.parse_line()
 
     def __str__(self):
         return (
@@ -71,109 +196,97 @@ class OpenHABItem(Item):
             f"    groupaddress_oh2:\t{self.groupaddress_oh2}\n"
         )
 
-    def myinit(self):
-        '''Read some config variables, if defined.
-        '''
-        if not OpenHABItem.all_items:
-            try:
-                OpenHABItem.autoupdateTrue = config.AUTOUPDATE_TRUE.replace(" ", "").split(",")
-            except (NameError, AttributeError):
-                pass
-
-            try:
-                OpenHABItem.autoupdateFalse = config.AUTOUPDATE_FALSE.replace(" ", "").split(",")
-            except (NameError, AttributeError):
-                pass
-
-    def __post_init__(self):
-        self.myinit()
-        self.parse_KNX_line()
-        OpenHABItem.add(self)
+    def __post_init__(self, tokens):
+        self.parse_KNX_line(tokens)
+        self.session.oh.add(self)
         self.calculate_sort_index()
         self.assign_KNX_devices()
 
-    def parse_KNX_line(self):
+    def parse_KNX_line(self, tokens=None):
         '''Extract knx address and OH" group address config etc.
         '''
+        try:
+            if tokens is None:
+                tokens = parse_line(self.line)
+        except KNX1SyntaxError as err:
+            print(f"ERROR: {err} in:")
+            print(self.line.rstrip('\r\n'))
+            print(' ' * err.pos + '^')
+            sys.exit(1)
 
         # find knx address etc.
-        self.groupaddress_oh1 = re.search(r'{.*(knx[ \t]*=.*)[ \t]*}', self.line).group(1)
-        self.type, self.name = self.line.split()[:2]
-        ga = re.search(r'[ \t]*knx[ \t]*=[ \t]*["\'](.*)["\']', self.groupaddress_oh1).group(1)
-        self.address = re.search(r'([0-9]*/[0-9]*/[0-9]*).*', ga).group(1)
+        self.groupaddress_oh1 = tokens.binding
+        self.type, self.name = tokens.type, tokens.name
+        self.address = tokens.addresses[0].address
+        try:
+            # all addresses are checked, the 1st one is the item's address
+            self.ga = [GroupAddress.parse(x.address) for x in tokens.addresses][0]
+        except ValueError as err:
+            print(f"ERROR: {err} in:")
+            print(self.line.rstrip('\r\n'))
+            sys.exit(1)
 
         # print warning on old style alexa, yet not supported
-        if re.search('alexa', self.line, re.IGNORECASE):
+        if tokens.alexa:
             print('Warning: Alexa only supported with this format: e.g. ["Lighting"].  As of now removed.')
             print(self.line)
 
         # datapoint
-        if ':' in ga:
-            self.dpt = re.search(r'[<>]?(.*):.*', ga).group(1)
+        self.dpt = next((x.dpt for x in tokens.addresses if x.dpt), None)
 
         # feedback
-        if '<' in ga:
-            self.feedback = re.search(r'.*<(.*:)?([0-9]*/[0-9]*/[0-9]*).*', ga).group(2)
-
-        # remove all spaces in group address
-        ga = self.groupaddress_oh1.replace(" ", "")
-
-        # knx
-        knx = re.search(r'(knx[ \t]*="[0-9/,+-<>]*").*', ga).group(1)
+        self.feedback = next((x.address for x in reversed(tokens.addresses) if x.flag == '<'), "")
 
         # extract option expire if applicable
-        if 'expire' in ga:
-            self.expire = re.search(r'.*[ \t]*expire[ \t]*=[ \t]*(["\'][\w,=]*["\'])[,]?.*', ga).group(1)
+        if 'expire' in tokens.options:
+            self.expire = tokens.options['expire'].replace(" ", "")
 
         # extract option autoupdate if applicable
-        if 'autoupdate' in ga:
-            self.autoupdate = re.search(r'.*[ \t]*autoupdate[ \t]*=[ \t]*(["\'][\w]*["\']).*', ga).group(1)
+        if 'autoupdate' in tokens.options:
+            self.autoupdate = tokens.options['autoupdate'].replace(" ", "")
         elif self.is_autoupdate_true():
             self.autoupdate = '"true"'
         elif self.is_autoupdate_false():
             self.autoupdate = '"false"'
 
-        # assign OH2 group address
+        # assign OH2 group address, w/o spaces
+        values = tokens.knx.split(',')
         if self.type == 'Dimmer':
-            values = re.sub(r'knx[ \t]*=|["\']', '', ga).split(',')
             if len(values) >= 3:
-                s, i, p = map(str.strip, values[:3])
+                s, i, p = values[:3]
                 self.groupaddress_oh2 = f'switch = "{s}", position = "{p}", increaseDecrease = "{i}"'
             else:
                 self.groupaddress_oh2 = f'switch = "{values[0]}"'
 
         elif self.type == 'Rollershutter':
-            try:
-                u, s, p = map(str.strip, re.sub(r'knx[ \t]*=|["\']', '', ga).split(',')[:3])
+            if len(values) >= 3:
+                u, s, p = values[:3]
                 self.groupaddress_oh2 = f'upDown = "{u}", stopMove = "{s}", position = "{p}"'
-            except (ValueError):
+            else:
                 print("ERROR: The following Rollershutter should have 3 KNX entries for: upDown, stopMove, position")
                 print(self.line)
 
         else:
             # default is ga
-            self.groupaddress_oh2 = knx.replace("knx", "ga")
+            self.groupaddress_oh2 = f'ga="{tokens.knx}"'
 
     def calculate_sort_index(self):
         '''Assign sortable number
         '''
-        self.sort_index = 0
-        for idx, f in enumerate(self.address.split('/')):
-            self.sort_index += int(f) * 10**(3 - idx)
+        self.sort_index = self.ga.sort_index
 
     def assign_KNX_devices(self):
         '''Assign corresponding KNX devices.
         '''
-        if len(KNXItem.items()) > 0:
-            devices = [x for x in KNXItem.items() if x.address == self.address]
+        knx = self.session.knx
+        config = self.session.config
+        matcher = self.session.devices
+        if len(knx) > 0:
+            devices = knx.by_address(self.ga)
 
             # print(devices)
 
-            selection = devices.copy()
-            try:
-                selection = list(filter(lambda x: not self.in_list(x.device_id, config.IGNORE_DEVICES), devices))
-            except (NameError, AttributeError):
-                pass
+            selection = [x for x in devices if not matcher.is_ignored(x.device_id)]
 
             if len(devices) == 0:
                 print(f"INFO: OH Item not found in ETS export: {self.address.ljust(8,' ')} "
@@ -188,12 +301,7 @@ class OpenHABItem(Item):
             else:
 
                 # join knxItem and ohItem
-                actors = []
-                try:
-                    actors = list(filter(lambda x: self.in_list(x.device_id, config.ACTORS),
-                                         selection))
-                except (NameError, AttributeError):
-                    pass
+                actors = [x for x in selection if matcher.is_actor(x.device_id)]
 
                 if len(actors) == 0:
                     print(f"INFO: No Actor found for: {self.address.ljust(8,' ')} "
@@ -204,18 +312,13 @@ class OpenHABItem(Item):
                     for entry in actors:
                         entry.ohItem = self
 
-                controls = []
-                try:
-                    controls = list(filter(lambda x: self.in_list(x.device_id, config.CONTROLS), selection))
-                except (NameError, AttributeError):
-                    pass
+                controls = [x for x in selection if matcher.is_control(x.device_id)]
 
                 for entry in controls:
                     entry.ohItem = self
                     entry.isControl = True
 
-                missing = list(filter(lambda x: not self.in_list(x.device_id, config.ACTORS + ',' + config.CONTROLS),
-                                      selection))
+                missing = [x for x in selection if not matcher.is_known(x.device_id)]
 
                 if len(missing) > 0:
                     for entry in missing:
@@ -226,62 +329,28 @@ class OpenHABItem(Item):
                 if len(intersect) > 0:
                     for entry in intersect:
                         print(f"KNX Item matches actor and control: {self.address.ljust(8,' ')}:")
-                        self.in_list(entry.device_id, config.ACTORS, True)
-                        self.in_list(entry.device_id, config.CONTROLS, True)
+                        matcher.explain(entry.device_id, 'ACTORS')
+                        matcher.explain(entry.device_id, 'CONTROLS')
                         print(entry)
 
-    def in_list(self, str, searchString, debug=False):
-        for i in searchString.replace(" ", "").split(","):
-            if i != "" and i in str:
-                if debug:
-                    print(f"{i} in {str} matches")
-                return True
-        return False
-
     def __eq__(self, other):
-        return self.address == other.address and self.name == other.name
+        return self.ga == other.ga and self.name == other.name
 
     def is_autoupdate_true(self):
-        if self.autoupdateTrue is None:
-            return False
-        for r in self.autoupdateTrue:
-            if re.match(r, self.name):
-                return True
-
-        return False
+        return self.session.autoupdate_true.match(self.name)
 
     def is_autoupdate_false(self):
-        if self.autoupdateFalse is None:
-            return False
-        for r in self.autoupdateFalse:
-            if re.match(r, self.name):
-                return True
-
-        return False
-
-    @classmethod
-    def add(cls, self):
-        '''Add item to list of all items.
-        '''
-        search = list(filter(lambda x: self == x, cls.all_items))
-        if len(search) == 0:
-            cls.all_items.append(self)
-        else:
-            print("ERROR: The following address is assigned twice in your item files:")
-            print(search)
-            print(self)
-            print(cls.all_items)
-            sys.exit(1)
+        return self.session.autoupdate_false.match(self.name)
 
 
+@slotted
 @dataclass(order=True)
 class KNXItem(Item):
     '''Helper class for storing relevant data per GA
     '''
-    all_items = []
-    wantedControls = None
+    device_sort_index = {}    # device_address: sortable number
 
-    device_address: str = config.DEVICE_GENERIC
+    device_address: str = None    # default: config.DEVICE_GENERIC
     refid: str = ""
     device_id: str = ""
     building: str = ""
@@ -305,33 +374,34 @@ class KNXItem(Item):
             f"    isControl     :\t{self.isControl}\n"
         )
 
-    def myinit(self):
-        '''Read some config variables, if defined.
-        '''
-        if not KNXItem.all_items:
-            try:
-                KNXItem.wantedControls = config.WANTED_CONTROLS.replace(" ", "").split(",")
-            except (NameError, AttributeError):
-                pass
-
     def __post_init__(self):
-        self.myinit()
-        KNXItem.add(self)
+        if self.device_address is None:
+            self.device_address = self.session.config.DEVICE_GENERIC
+        self.ga = GroupAddress.parse(self.address)
+        self.session.knx.add(self)
         self.calculate_sort_index()
 
     def calculate_sort_index(self):
         '''Assign sortable number by device_address and knx address
         '''
-        self.sort_index = 0
-        for idx, f in enumerate(self.address.split('/')):
-            self.sort_index += int(f) * 10**(3 - idx)
+        self.sort_index = self.ga.sort_index + KNXItem.get_device_sort_index(self.device_address)
 
-        if '.' in self.device_address:
-            for idx, f in enumerate(self.device_address.split('.')):
-                self.sort_index += int(f) * 10**(3 - idx) * 10**4
+    @staticmethod
+    def get_device_sort_index(device_address):
+        '''Returns sortable number of device_address, e.g. 1.1.12
+        '''
+        device = KNXItem.device_sort_index.get(device_address)
+        if device is None:
+            device = 0
+            if '.' in device_address:
+                for idx, f in enumerate(device_address.split('.')):
+                    device += int(f) * 10**(3 - idx) * 10**4
+            KNXItem.device_sort_index[device_address] = device
+        return device
 
     def __eq__(self, other):
-        return self.get_id() == other.get_id() and self.isControl == other.isControl
+        return (self.ga == other.ga and self.device_address == other.device_address
+                and self.isControl == other.isControl)
 
     def error_not_unique(self, duplicate):
         print("ERROR: The following address exits twice in your ETS file:")
@@ -340,7 +410,7 @@ class KNXItem(Item):
         sys.exit(1)
 
     def __hash__(self):
-        return hash(self.get_id() + "1" if self.isControl else "0")
+        return hash((self.device_address, self.ga, self.isControl))
 
     def get_id(self):
         return self.device_address + '-' + self.address.replace("/", "_")
@@ -360,25 +430,23 @@ class KNXItem(Item):
         return ""
 
     def is_generic(self):
-        return self.device_address == config.DEVICE_GENERIC
+        return self.device_address == self.session.config.DEVICE_GENERIC
 
     def is_wanted_control(self):
-        if KNXItem.wantedControls is None or self.ohItem is None:
+        if self.ohItem is None:
             return False
-        for r in KNXItem.wantedControls:
-            if re.match(r, self.ohItem.name):
-                return True
-
-        return False
+        return self.session.wanted_controls.match(self.ohItem.name)
 
     def get_item_representation(self, line=None):
+        config = self.session.config
         if self.ohItem is None:
             name = self.get_id()
         else:
             name = self.ohItem.name
 
-        channel = (config.CHANNEL.replace('<generic>', self.get_device_name())
-                   + self.get_expire() + self.get_auto_update())
+        device = self.get_device_name()
+        options = self.get_expire() + self.get_auto_update()
+        render = self.session.channel.render
 
         if line is None:
             unique = ""
@@ -394,9 +462,9 @@ class KNXItem(Item):
                 type = self.ohItem.type
 
             result = (f'{type} {name}{unique} "{self.name}" '
-                      + '{' + channel.replace('<name>', name + unique) + '}')
+                      + '{' + render(generic=device, name=name + unique) + options + '}')
         else:
-            result = re.sub(r'{.*}', '{' + channel.replace('<name>', name) + '}', line)
+            result = BINDING.sub('{' + render(generic=device, name=name) + options + '}', line)
         return result
 
     @classmethod
@@ -405,18 +473,114 @@ class KNXItem(Item):
 
         :param OpenHABItem item: OpenHABItem to be referred to
         '''
-        return KNXItem(name=ohItem.name,
+        return KNXItem(session=ohItem.session,
+                       name=ohItem.name,
                        address=ohItem.address,
                        ohItem=ohItem,
                        isControl=isControl)
 
-    @classmethod
-    def add(cls, self):
+
+class OpenHABItems:
+    '''All OpenHABItems of one conversion, see ConversionSession
+    '''
+
+    def __init__(self):
+        self.all_items = []
+        self.item_index = {}    # (ga, name): OpenHABItem
+
+    def __len__(self):
+        return len(self.all_items)
+
+    def items(self):
+        return self.all_items
+
+    def add(self, item):
         '''Add item to list of all items.
         '''
-        search = list(filter(lambda x: self == x, cls.all_items))
+        key = (item.ga, item.name)
+        search = [self.item_index[key]] if key in self.item_index else []
         if len(search) == 0:
-            cls.all_items.append(self)
+            self.all_items.append(item)
+            self.item_index[key] = item
+        else:
+            print("ERROR: The following address is assigned twice in your item files:")
+            print(search)
+            print(item)
+            print(self.all_items)
+            sys.exit(1)
+
+
+class KNXItems:
+    '''All KNXItems of one conversion w/ indexes by group address, see ConversionSession
+    '''
+
+    def __init__(self):
+        # id(KNXItem): KNXItem in the order added, so remove() does not need to search
+        self.all_items = {}
+        self.address_index = {}    # ga: {id(KNXItem): KNXItem, ...}
+        self.device_index = {}     # (device_address, ga): {id(KNXItem): KNXItem, ...}
+        self.duplicates = 0        # items rejected by add()
+        self.removed = 0
+
+    def __len__(self):
+        return len(self.all_items)
+
+    def items(self):
+        return list(self.all_items.values())
+
+    def add_records(self, session, records):
+        '''Adds a KNXItem per GARecord, see ets.read_project().
+        '''
+        for record in records:
+            KNXItem(session=session, **record._asdict())
+
+    def assigned(self):
+        '''Returns all items assigned to an OpenHABItem, in the order added.
+        '''
+        return [x for x in self.all_items.values() if x.ohItem is not None]
+
+    def unused(self):
+        '''Returns all items neither exported nor ignored, sorted by KNXItem.sort_key.
+        '''
+        return sorted(filter(lambda x: not x.exported and not x.ignore, self.all_items.values()),
+                      key=KNXItem.sort_key)
+
+    def sorted(self):
+        '''Returns all items sorted by KNXItem.sort_key.
+        '''
+        return sorted(self.all_items.values(), key=KNXItem.sort_key)
+
+    def add(self, item):
+        '''Add item to list of all items.
+        '''
+        # isControl may change after add, so compare w/ all items at the same device instead of a fixed key
+        search = [x for x in self.device_index.get((item.device_address, item.ga), {}).values() if item == x]
+        if len(search) == 0:
+            self.all_items[id(item)] = item
+            self.address_index.setdefault(item.ga, {})[id(item)] = item
+            self.device_index.setdefault((item.device_address, item.ga), {})[id(item)] = item
         else:
             # nop, we accept duplicates in ETS file
-            pass
+            self.duplicates += 1
+
+    def remove(self, item):
+        '''Remove item from list of all items and its indexes.
+        '''
+        del self.all_items[id(item)]
+        self.removed += 1
+        del self.address_index[item.ga][id(item)]
+        del self.device_index[(item.device_address, item.ga)][id(item)]
+
+    def by_address(self, address):
+        '''Returns all items w/ given group address, either GroupAddress or "a/b/c".
+        '''
+        if isinstance(address, str):
+            address = GroupAddress.parse(address)
+        return list(self.address_index.get(address, {}).values())
+
+    def by_device(self, device_address, address):
+        '''Returns all items w/ given group address, either GroupAddress or "a/b/c", at given device.
+        '''
+        if isinstance(address, str):
+            address = GroupAddress.parse(address)
+        return list(self.device_index.get((device_address, address), {}).values())
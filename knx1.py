@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+'''Tokenizer for knx1 item lines of openHAB 1.x item files, e.g.:
+
+    Switch Light "Light" (gAll) { knx="1.001:1/0/1+<1/0/2", expire="1h,command=OFF", autoupdate="false" }
+
+Disclaimer:
+
+   This file is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+'''
+
+import re
+from collections import namedtuple
+
+# item type and name followed by everything up to the opening brace of the binding block,
+# braces within quoted labels or tags are skipped
+HEAD = re.compile(r'(\S+)[ \t]+(\S+)[^"{]*(?:"[^"]*"[^"{]*)*\{')
+
+# one binding option: key="value", the value ends at the 1st matching quote, followed by ',' or '}'
+OPTION = re.compile(r'[ \t]*(\w+)[ \t]*=[ \t]*(["\'])((?:(?!\2).)*)\2')
+SEPARATOR = re.compile(r'[ \t]*([,}])')
+CLOSE = re.compile(r'[ \t]*\}')
+SPACE = re.compile(r'[ \t]*')
+
+# one group address of the knx option: [<>][dpt:]a/b/c followed by '+' (same channel), ',' (next channel) or end
+ADDRESS = re.compile(r'[ \t]*([<>]?)[ \t]*(?:([0-9.]+)[ \t]*:)?[ \t]*([0-9]+/[0-9]+/[0-9]+)[ \t]*([+,]?)')
+
+# The usual line w/ knx as 1st option is matched at once.  All other lines are tokenized step by step
+# by the patterns above, which also gives the exact position of a syntax error, e.g. of a 2nd knx option.
+LINE = re.compile(r'(\S+)[ \t]+(\S+)[^"{]*(?:"[^"]*"[^"{]*)*\{'
+                  r'[ \t]*(knx)[ \t]*=[ \t]*(["\'])'
+                  r'([ \t]*[<>]?[ \t]*(?:[0-9.]+[ \t]*:)?[ \t]*[0-9]+/[0-9]+/[0-9]+[ \t]*'
+                  r'(?:[+,][ \t]*[<>]?[ \t]*(?:[0-9.]+[ \t]*:)?[ \t]*[0-9]+/[0-9]+/[0-9]+[ \t]*)*)\4'
+                  r'((?:[ \t]*,[ \t]*(?!knx\b)\w+[ \t]*=[ \t]*(["\'])(?:(?!\7).)*\7)*)'
+                  r'[ \t]*,?[ \t]*\}')
+LINE_OPTION = re.compile(r'(\w+)[ \t]*=[ \t]*(["\'])((?:(?!\2).)*)\2')
+LINE_ADDRESS = re.compile(r'([<>]?)(?:([0-9.]+):)?([0-9]+/[0-9]+/[0-9]+)([+,]?)')
+
+
+class KNX1SyntaxError(ValueError):
+    '''Raised for item lines which can not be parsed, pos is the index of the offending character.
+    '''
+
+    def __init__(self, message, line, pos):
+        super().__init__(f"{message} at column {pos + 1}")
+        self.line = line
+        self.pos = pos
+
+
+# one group address of the knx option, flag is '<', '>' or '', dpt is '' if not given
+KNX1Address = namedtuple('KNX1Address', 'flag dpt address separator')
+
+# tokens of one knx1 item line
+#   binding:   knx="..." up to the end of the binding block
+#   knx:       value of the knx option w/o blanks
+#   addresses: [KNX1Address, ...], separator ',' starts the next channel
+#   options:   all other options {key: quoted value}
+KNX1Line = namedtuple('KNX1Line', 'type name binding knx addresses options alexa')
+
+
+def parse_line(line):
+    '''Splits a knx1 item line into its tokens, see KNX1Line.
+
+    :raises KNX1SyntaxError: if the line is malformed
+    '''
+    match = LINE.match(line)
+    if match is None:
+        return parse_steps(line)
+
+    knx = match.group(5).replace(" ", "").replace("\t", "")
+    return KNX1Line(match.group(1),
+                    match.group(2),
+                    line[match.start(3):match.end() - 1],
+                    knx,
+                    list(map(KNX1Address._make, LINE_ADDRESS.findall(knx))),
+                    {key: quote + value + quote for key, quote, value in LINE_OPTION.findall(match.group(6))},
+                    'alexa' in line.lower())
+
+
+def parse_steps(line):
+    '''Tokenizes a knx1 item line option by option and address by address.
+
+    :raises KNX1SyntaxError: w/ position of the 1st unexpected character
+    '''
+    head = HEAD.match(line)
+    if head is None:
+        raise KNX1SyntaxError("item type, name and binding block '{' expected", line, len(line.rstrip()))
+
+    # binding options
+    options = {}
+    knx = None
+    pos = head.end()
+    while True:
+        option = OPTION.match(line, pos)
+        if option is None:
+            raise KNX1SyntaxError('option key="value" expected', line, SPACE.match(line, pos).end())
+
+        key, quote, value = option.groups()
+        if key == 'knx':
+            if knx is not None:
+                raise KNX1SyntaxError("knx option given twice", line, option.start(1))
+            knx = option
+        else:
+            options[key] = quote + value + quote
+
+        pos = option.end()
+        separator = SEPARATOR.match(line, pos)
+        if separator is None:
+            raise KNX1SyntaxError("',' or '}' expected", line, SPACE.match(line, pos).end())
+
+        pos = separator.end()
+        end = separator.group(1)
+        if end == ',' and CLOSE.match(line, pos):
+            pos = CLOSE.match(line, pos).end()
+            end = '}'
+        if end == '}':
+            break
+
+    if knx is None:
+        raise KNX1SyntaxError("knx option expected", line, head.end())
+
+    binding = line[knx.start(1):pos - 1]
+
+    # group addresses
+    addresses = []
+    pos, end = knx.span(3)
+    while True:
+        address = ADDRESS.match(line, pos, end)
+        if address is None:
+            raise KNX1SyntaxError("group address expected", line, pos)
+
+        flag, dpt, ga, separator = address.groups()
+        addresses.append(KNX1Address(flag, dpt or '', ga, separator))
+        pos = address.end()
+        if not address.group(4):
+            break
+
+    if pos != end:
+        raise KNX1SyntaxError("'+' or ',' expected", line, pos)
+
+    return KNX1Line(type=head.group(1),
+                    name=head.group(2),
+                    binding=binding,
+                    knx=knx.group(3).replace(" ", "").replace("\t", ""),
+                    addresses=addresses,
+                    options=options,
+                    alexa='alexa' in line.lower())
@@ -8,11 +8,47 @@ parser.add_argument('-c', '--config_file',
                     default='config',
                     action='store',
                     help='Specify config filename without extension ".py" (default: %(default)s[.py])')
-args = parser.parse_args()
+parser.add_argument('-j', '--jobs',
+                    type=int,
+                    default=1,
+                    action='store',
+                    help='Number of processes reading PROJECTFILES and ITEMS_FILES in parallel, 0 for all cores '
+                         '(default: %(default)s).  In batch mode number of sites converted in parallel.')
+parser.add_argument('-b', '--batch',
+                    metavar='MANIFEST',
+                    action='store',
+                    help='Convert all sites listed in MANIFEST, one config file [directory] per line, see batch.py')
+parser.add_argument('-w', '--watch',
+                    action='store_true',
+                    help='Keep running and convert again whenever the config or any of its input files changes')
+parser.add_argument('-s', '--serve',
+                    metavar='ADDRESS',
+                    action='store',
+                    help='Keep running and convert on request, ADDRESS is [host:]port or the path of a Unix socket, '
+                         'see service.py')
+parser.add_argument('--stats',
+                    metavar='FILE',
+                    nargs='?',
+                    const='-',
+                    action='store',
+                    help='Write time, peak memory and counters per step as JSON to FILE (default: stderr)')
+parser.add_argument('--profile',
+                    metavar='STEP',
+                    action='store',
+                    help='Run STEP under cProfile and write STEP.prof, e.g. read_ets_file or write_item_files')
+
+
+def parse_args(argv=None):
+    '''Returns options given by argv, default: command line.
+    '''
+    return parser.parse_args(argv)
+
 
-# read in (custom) config file
-try:
-    config = import_module(args.config_file)
-except ImportError as err:
-    print(f'Error: {err}[.py]')
-    exit(1)
+def load_config(config_file):
+    '''Returns (custom) config module, script is terminated if not found.
+    '''
+    try:
+        return import_module(config_file)
+    except ImportError as err:
+        print(f'Error: {err}[.py]')
+        exit(1)
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+'''Keeps running and converts on request over a local HTTP or Unix socket, see option -s and serve().
+
+The config is loaded and the PROJECTFILES are read once, following requests only read the projects again if they
+changed.  Requests and responses are JSON:
+
+    POST /convert   {"items_files": {"myhome.items": "<content>", ...}}
+                    converts the item files given, or the ITEMS_FILES of the config if none are given, returns
+                    {"files": {"<output file>": "<content>", ...}, "log": "<printed>", "seconds": 0.12}
+                    Nothing is written to disk.  Status 400 if the conversion fails.
+    GET  /stats     returns number of requests, their latency and the hit rate of the projects read
+
+e.g.  curl --unix-socket knx.sock -d @request.json http://localhost/convert
+
+The conversion at start, which reads the projects, is counted as a request as well.
+
+Disclaimer:
+
+   This file is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+'''
+
+import io
+import json
+import os
+import socketserver
+import stat
+import sys
+import time
+import traceback
+from collections import Counter
+from contextlib import contextmanager, redirect_stdout
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from watch import WatchSession
+
+
+class ServiceSession(WatchSession):
+    '''WatchSession converting item files given by a request and keeping all output files in memory.
+    '''
+
+    def __init__(self, service, items_files=None):
+        '''
+        :param Service service: service the request was sent to
+        :param dict items_files: name: content of item files to be converted instead of ITEMS_FILES
+        '''
+        super().__init__(service.config, service.projects)
+        self.service = service
+        self.items_files = items_files
+        self.outputs = {}    # filename: content
+
+    def read_project(self, projectfile, ets_config):
+        self.service.counters['projects_cached' if self.project_read(projectfile, ets_config) else 'projects_read'] += 1
+        return super().read_project(projectfile, ets_config)
+
+    def read_oh_files(self):
+        if not self.items_files:
+            super().read_oh_files()
+            return
+
+        for myfile, content in self.items_files.items():
+            print(f"reading {myfile}")
+            self.read_oh_lines(myfile, io.StringIO(content, newline=None).readlines())
+
+    def makedirs(self, directory):
+        return False
+
+    @contextmanager
+    def open_output(self, filename, encoding=None):
+        lines = []
+        yield lines
+        self.outputs[filename] = ''.join(lines)
+
+
+class Service:
+    '''Config, projects read and statistics shared by all requests.
+    '''
+
+    def __init__(self, config):
+        self.config = config
+        self.projects = {}          # see WatchSession
+        self.counters = Counter()
+        self.seconds = []           # latency per request
+
+    def convert(self, items_files=None):
+        '''Returns (ok, response) of one conversion.
+        '''
+        start = time.perf_counter()
+        output = io.StringIO()
+        ok = True
+        files = {}
+        with redirect_stdout(output):
+            try:
+                session = ServiceSession(self, items_files)
+                session.run()
+                files = session.outputs
+            except SystemExit:
+                ok = False
+            except Exception:
+                traceback.print_exc(file=output)
+                ok = False
+
+        seconds = time.perf_counter() - start
+        self.seconds.append(seconds)
+        self.counters['requests'] += 1
+        if not ok:
+            self.counters['failed'] += 1
+
+        return ok, {'files': files, 'log': output.getvalue(), 'seconds': seconds}
+
+    def stats(self):
+        seconds = sorted(self.seconds)
+        projects = self.counters['projects_cached'] + self.counters['projects_read']
+        return {
+            'requests': self.counters['requests'],
+            'failed': self.counters['failed'],
+            'seconds': {'total': sum(seconds),
+                        'min': seconds[0] if seconds else None,
+                        'median': seconds[len(seconds) // 2] if seconds else None,
+                        'max': seconds[-1] if seconds else None,
+                        'last': self.seconds[-1] if seconds else None},
+            'projects_cached': self.counters['projects_cached'],
+            'projects_read': self.counters['projects_read'],
+            'projects_hit_rate': self.counters['projects_cached'] / projects if projects else None,
+        }
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    '''Handles requests of the API, see module documentation.
+    '''
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self.reply(200, self.server.service.stats())
+        else:
+            self.reply(404, {'error': f'unknown path {self.path}'})
+
+    def do_POST(self):
+        if self.path != '/convert':
+            self.reply(404, {'error': f'unknown path {self.path}'})
+            return
+
+        try:
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            request = json.loads(body or '{}')
+            items_files = request.get('items_files')
+            if items_files is not None and not (isinstance(items_files, dict)
+                                                and all(isinstance(x, str) for x in items_files.values())):
+                raise ValueError('items_files must map file names to their content')
+        except (ValueError, AttributeError) as err:
+            self.reply(400, {'error': f'invalid request: {err}'})
+            return
+
+        ok, response = self.server.service.convert(items_files)
+        self.log_message('converted in %.3f seconds%s', response['seconds'], '' if ok else ', failed')
+        self.reply(200 if ok else 400, response)
+
+    def reply(self, status, response):
+        content = json.dumps(response).encode('utf8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def address_string(self):
+        # no client address on a Unix socket
+        return str(self.client_address or self.server.server_address)
+
+
+class UnixHTTPServer(socketserver.UnixStreamServer):
+    '''HTTPServer listening on a Unix socket.
+    '''
+
+    def server_bind(self):
+        # remove socket left over by a former service, but nothing else
+        if is_socket(self.server_address):
+            os.remove(self.server_address)
+        elif os.path.lexists(self.server_address):
+            print(f"ERROR: {self.server_address} exists and is no socket")
+            sys.exit(1)
+        super().server_bind()
+
+
+def is_socket(filename):
+    '''Returns True if filename is a Unix socket.
+    '''
+    try:
+        return stat.S_ISSOCK(os.lstat(filename).st_mode)
+    except OSError:
+        return False
+
+
+def serve(config, address):
+    '''Serves conversions w/ config on address, either [host:]port or the path of a Unix socket.
+
+    Requests are handled one after another.  Runs until interrupted by Ctrl-C.
+    '''
+    host, _, port = address.rpartition(':')
+    if port.isdigit():
+        server = HTTPServer((host or 'localhost', int(port)), RequestHandler)
+        print(f"serving on http://{host or 'localhost'}:{port}")
+    else:
+        server = UnixHTTPServer(address, RequestHandler)
+        print(f"serving on {address}")
+    server.service = Service(config)
+
+    # warm up: read the projects before the first request
+    ok, response = server.service.convert()
+    print(response['log'], end='')
+    print(f"converted in {response['seconds']:.2f} seconds, waiting for requests, Ctrl-C to stop")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if isinstance(server, UnixHTTPServer) and is_socket(address):
+            os.remove(address)
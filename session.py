@@ -0,0 +1,556 @@
+#!/usr/bin/env python3
+'''Provides for one conversion of knx1 item files and ETS project files, see ConversionSession.
+
+Disclaimer:
+
+   This file is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+'''
+
+import locale
+import os
+import sys
+from collections import OrderedDict as od
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import repeat
+import re
+import stat
+import tempfile
+from os import path
+
+from ets import cache_key, read_project, read_project_counted, settings
+from groupaddress import GroupAddress
+from knx1 import KNX1SyntaxError, parse_line
+from items import DeviceMatcher, KNXItem, KNXItems, NameMatcher, OpenHABItem, OpenHABItems
+from store import SQLiteKNXItems
+
+# number of output files written at the same time, see ConversionSession.open_output()
+OUTPUT_THREADS = 8
+
+# permissions of new output files are the same as of open(), which mkstemp() does not use
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+def parse_items(lines, channels):
+    '''Returns lines of an item file w/ knx items replaced by (line, KNX1Line), see knx1.parse_line().
+
+    KNX1Line is None if the line is malformed, the error is reported once the item is created.
+    '''
+    result = []
+    for line in lines:
+        # knx items only, remove trailing comments //
+        if line.startswith(channels) and re.match(r'.*knx[ ]*=.*', re.sub(r'//.*', '', line)):
+            try:
+                result.append((line, parse_line(line)))
+            except KNX1SyntaxError:
+                result.append((line, None))
+        else:
+            result.append(line)
+    return result
+
+
+def parse_items_file(filename, encoding, channels):
+    '''Returns parse_items() of item file filename, used by worker processes.
+    '''
+    with open(filename, 'r', encoding=encoding) as infile:
+        return parse_items(infile.readlines(), channels)
+
+
+class Template:
+    '''Text of config w/ placeholders, e.g. <generic>.
+
+    The placeholders are resolved once, so rendering is a single str.format() call instead of one str.replace()
+    per placeholder.
+    '''
+
+    def __init__(self, text, *names):
+        text = text.replace('{', '{{').replace('}', '}}')
+        for name in names:
+            text = text.replace(f'<{name}>', '{' + name + '}')
+        self.render = text.format
+
+
+class ConversionSession:
+    '''Converts the files given by one config module.
+
+    A session owns all items read and the matchers compiled from its config, so any number of sessions
+    may run one after another or in parallel threads within the same interpreter.
+    '''
+    # methods called by run(), in this order
+    STEPS = ('read_ets_file', 'read_oh_files', 'cleanup_feedback', 'create_generic_controls', 'write_debug_files',
+             'write_item_files', 'write_unused_files', 'write_thing_files', 'commit_files')
+
+    def __init__(self, config, jobs=1, projects=None, stats=None):
+        '''
+        :param config: config module, see config.py
+        :param int jobs: number of processes reading PROJECTFILES in parallel, 0 for all cores
+        :param dict projects: GARecords read by former sessions, see ets.read_project()
+        :param Stats stats: collects time, memory and counters per step of run(), see stats.py
+        '''
+        self.config = config
+        self.jobs = jobs
+        self.projects = projects
+        self.stats = stats
+        self.reading = {}    # projectfile: Future of ets.read_project_counted() in a worker process
+
+        item_store = getattr(config, 'ITEM_STORE', None)
+        if item_store is None:
+            self.knx = KNXItems()
+        else:
+            self.knx = SQLiteKNXItems(item_store, self)
+        self.oh = OpenHABItems()
+
+        # item files read: name as in ITEMS_FILES: [line or OpenHABItem, ...]
+        self.oh_files = od()
+
+        # output files not written as their content did not change, see open_output()
+        self.unchanged = []
+
+        # output files rendered but not yet written: filename: Future of commit_file(), see open_output()
+        self.pending = od()
+        self.writer = None
+
+        self.devices = DeviceMatcher.get(config)
+        self.wanted_controls = NameMatcher.get(config, 'WANTED_CONTROLS')
+        self.autoupdate_true = NameMatcher.get(config, 'AUTOUPDATE_TRUE')
+        self.autoupdate_false = NameMatcher.get(config, 'AUTOUPDATE_FALSE')
+
+        self.channel = Template(config.CHANNEL, 'generic', 'name')
+        self.device = Template(config.DEVICE, 'address', 'generic', 'building', 'device_id')
+        self.device_empty = config.DEVICE_EMPTY.replace('<generic>', config.DEVICE_GENERIC)
+
+    def run(self):
+        '''Reads all input files and writes all output files.
+        '''
+        try:
+            self.run_steps()
+        finally:
+            # also if a step failed: files rendered before are written before the caller may change directory
+            self.commit_files()
+
+        if self.unchanged:
+            print(f"{len(self.unchanged)} files unchanged, not written: {', '.join(self.unchanged)}")
+
+    def run_steps(self):
+        '''Calls all STEPS, measured by stats if given.
+        '''
+        if self.stats is None:
+            for step in self.STEPS:
+                getattr(self, step)()
+        else:
+            matchers = (self.devices, self.wanted_controls, self.autoupdate_true, self.autoupdate_false)
+            evaluations = sum(x.evaluations for x in matchers)
+            for step in self.STEPS:
+                with self.stats.step(step):
+                    getattr(self, step)()
+
+            # matchers may be shared w/ other sessions
+            self.stats.counters.update(knx_items_created=len(self.knx) + self.knx.removed,
+                                       knx_duplicates_rejected=self.knx.duplicates,
+                                       knx_items_removed=self.knx.removed,
+                                       oh_items_created=len(self.oh),
+                                       regex_evaluations=sum(x.evaluations for x in matchers) - evaluations)
+
+    def cleanup_feedback(self):
+        '''Removes KNXItems which are known feedback group addresses
+        '''
+
+        def is_assigned_feedback(item1, item2):
+            '''Returns true if group address of a device is already used as a feedback address at the same device
+            '''
+            result = (item1 != item2 and                                      # not the same item
+                      item1.device_address == item2.device_address and        # same device
+                      item1.ohItem is None and                                # item1 not assigned in OH item file
+                      item2.ohItem is not None and                            # item2 is assigned in OH item file
+                      item1.ga == GroupAddress.parse(item2.ohItem.feedback))  # item1 used as feedback of item2
+
+            return result
+
+        # remove already assigned feedback GAs at the same device
+        for item in [x for x in self.knx.assigned() if x.ohItem.feedback]:
+            for foundItem in [x for x in self.knx.by_device(item.device_address, item.ohItem.feedback)
+                              if is_assigned_feedback(x, item)]:
+                self.knx.remove(foundItem)
+
+    def create_generic_controls(self):
+        '''Creates a generic control entry for any control that is used in an item file
+        '''
+        allControls = list(od.fromkeys(filter(lambda x: x.isControl
+                                              and x.is_wanted_control(), self.knx.assigned())).keys())
+        for item in allControls:
+            KNXItem.create_generic(ohItem=item.ohItem, isControl=True)
+            item.ignore = True
+
+    def read_ets_file(self):
+        '''Reads the ETS Project file if defined.
+        '''
+        projectfiles = getattr(self.config, 'PROJECTFILES', None)
+        if projectfiles is None:
+            print('PROJECTFILE is not defined (see config.py), so we proceed w/o ETS input.')
+            return
+
+        projectfiles = projectfiles.split()
+        jobs = min(self.jobs or os.cpu_count(), len(projectfiles))
+        ets_config = settings(self.config)
+
+        results = []
+        if jobs > 1:
+            # parse projects not read before in worker processes, merge in given order to keep duplicate handling
+            # of KNXItems.add, see load_project()
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                self.reading = {x: executor.submit(read_project_counted, x, ets_config)
+                                for x in projectfiles if not self.project_read(x, ets_config)}
+                for projectfile in projectfiles:
+                    print(f"reading {projectfile}")
+                    results.append(self.read_project(projectfile, ets_config))
+        else:
+            for projectfile in projectfiles:
+                print(f"reading {projectfile}")
+                results.append(self.read_project(projectfile, ets_config))
+
+        for records in results:
+            self.knx.add_records(self, records)
+
+    def project_read(self, projectfile, ets_config):
+        '''Returns True if projectfile was read by a former session, i.e. read_project() does not read it again.
+        '''
+        return self.projects is not None and cache_key(projectfile, ets_config) in self.projects
+
+    def read_project(self, projectfile, ets_config):
+        '''Returns all GARecords of projectfile, see ets.read_project().
+        '''
+        if projectfile not in self.reading:
+            return read_project(projectfile, ets_config, self.projects,
+                                None if self.stats is None else self.stats.counters)
+
+        records = self.load_project(projectfile, ets_config)
+        if self.projects is not None:
+            self.projects[cache_key(projectfile, ets_config)] = records
+        return records
+
+    def load_project(self, projectfile, ets_config):
+        '''Returns all GARecords of projectfile w/o looking at projects read before, see read_project().
+
+        Waits for the worker process if the project is read in parallel, see read_ets_file().
+        '''
+        counters = None if self.stats is None else self.stats.counters
+        future = self.reading.pop(projectfile, None)
+        if future is None:
+            return read_project(projectfile, ets_config, stats=counters)
+
+        records, stats = future.result()
+        if counters is not None:
+            counters.update(stats)
+        return records
+
+    def read_oh_files(self):
+        '''Reads the OpenHAB item file(s) if defined
+        '''
+        config = self.config
+        items_files = getattr(config, 'ITEMS_FILES', None)
+        if items_files is None:
+            print('ITEMS_FILES are not defined (see config.py), so we proceed w/o OpenHAB item files.')
+            return
+
+        myfiles = list(map(str.strip, items_files.split(',')))
+        filenames = [x.strip('\\\r\n').strip() for x in myfiles]
+        jobs = min(self.jobs or os.cpu_count(), len(myfiles))
+
+        if jobs > 1:
+            # parse in worker processes, create items in given order, so they are assigned as if read one by one
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                results = executor.map(parse_items_file, filenames, repeat(config.IN_ENCODING), repeat(config.CHANNELS))
+                for myfile, filename in zip(myfiles, filenames):
+                    print(f"reading {filename}")
+                    self.add_oh_lines(myfile, next(results))
+        else:
+            for myfile, filename in zip(myfiles, filenames):
+                print(f"reading {filename}")
+                with open(filename, 'r', encoding=config.IN_ENCODING) as infile:
+                    self.read_oh_lines(myfile, infile.readlines())
+
+    def read_oh_lines(self, myfile, lines):
+        '''Parses the lines of item file myfile, as named in ITEMS_FILES.
+        '''
+        self.add_oh_lines(myfile, parse_items(lines, self.config.CHANNELS))
+
+    def add_oh_lines(self, myfile, lines):
+        '''Creates an OpenHABItem per knx item of parse_items() and keeps the lines of item file myfile.
+        '''
+        result = self.oh_files[myfile] = []
+        for line in lines:
+            if isinstance(line, str):
+                result.append(line)
+            else:
+                # create item per row
+                line, tokens = line
+                result.append(OpenHABItem(session=self, line=line, tokens=tokens))
+
+    def write_thing_file(self, items, filename, comment=''):
+        '''Write openhab thing file w/ KNXItems items, sorted by KNXItem.sort_key.  See config.THING*
+        '''
+        config = self.config
+
+        # create path to outfile if it doesn't existant
+        filepath = os.path.split(filename)[0]
+        print(filename, filepath)
+        if self.makedirs(filepath):
+            print("mkdir:" + filepath)
+
+        with self.open_output(filename, config.OUT_ENCODING) as thingfile:
+            thingfile.append(comment + '\n')
+            thingfile.append(config.THING_HEADER + '\n')
+
+            current = -1
+            for item in items:
+
+                # print device if new
+                if current != item.device_address:
+                    if current != -1:
+                        thingfile.append("    }\n")
+                    current = item.device_address
+                    if current is None:
+                        dev = self.device_empty
+                    else:
+                        dev = self.device.render(address=current,
+                                                 generic=item.get_device_name(),
+                                                 building=item.building,
+                                                 device_id=item.device_id)
+
+                    thingfile.append(dev + '\n')
+
+                # print OH Item
+                control = unique = ''
+                if item.isControl:
+                    if not item.is_wanted_control():
+                        continue
+
+                    control = "-control"
+                    if item.is_generic:
+                        unique = config.CONTROL_SUFFIX
+                    else:
+                        unique = item.get_device_name('_')
+
+                if item.ohItem:
+                    thingfile.append(f'\tType {item.ohItem.type.lower()}{control} :  '
+                                     f'{item.ohItem.name}{unique} "{item.name}" [ {item.ohItem.groupaddress_oh2} ]\n')
+                else:
+                    thingfile.append(f'\tType {config.UNUSED_TYPE}{control} :  '
+                                     f'{item.get_id()}{unique} "{item.name}" [ ga="{item.address}" ]\n')
+
+            # print footer
+            thingfile.append('    }\n'
+                             '}\n')
+
+    def write_item_files(self):
+        '''Write openhab item files.  See config.ITEMS_FILES.
+        '''
+        config = self.config
+
+        # create path to outfiles if it doesn't existant
+        self.makedirs(config.ITEM_RESULT_DIR)
+
+        for myfile, lines in self.oh_files.items():
+
+            outfilename = os.path.join(config.ITEM_RESULT_DIR, path.basename(myfile))
+
+            with self.open_output(outfilename, config.OUT_ENCODING) as outfile:
+
+                # replace knx2 values in lines read from original item file
+                for line in lines:
+
+                    if isinstance(line, str):
+                        # non knx items and comments
+                        outfile.append(line)
+                    else:
+                        # knx item
+                        ohItem = line
+                        line = ohItem.line
+                        knx = ohItem.address
+
+                        # find according ETS Actor by GroupAddress
+                        items = [x for x in self.knx.by_address(ohItem.ga) if not x.isControl and not x.exported]
+                        if len(items) == 0:
+                            # seems like we're running w/o ETS project file so create a generic entry
+                            item = KNXItem.create_generic(ohItem=ohItem)
+
+                        elif len(items) > 1:   # multiple entries found
+                            print(f"INFO: Multiple item file entries w/ Group Address {knx} found."
+                                  f"\tusing: {config.DEVICE_GENERIC}")
+                            for item in items:
+                                item.ignore = True  # "remove others"
+                                item.exported = True
+
+                            # Use 1st one
+                            hit = next(obj for obj in items if obj.ohItem is not None)
+                            item = KNXItem.create_generic(ohItem=hit.ohItem)
+
+                        else:
+                            # exactly one item entry found
+                            item = items[0]
+
+                        outfile.append(item.get_item_representation(line))
+                        item.exported = True
+
+                        # add generic control item if aplicable
+                        items = [x for x in self.knx.by_device(item.device_address, item.ga)
+                                 if x.is_generic and x.isControl and item.is_wanted_control()]
+                        if len(items) > 1:
+                            # should not happen there should be only one generic item
+                            print(f"ERROR: Multiple generic controls w/ Group Address {knx} found.")
+                            sys.exit(1)
+
+                        if len(items) == 1:
+                            outfile.append(items[0].get_item_representation() + '\n')
+                            items[0].exported = True
+
+    def write_files(self):
+        '''Link OpenHABitems and KNXItems and writes
+        ITEMS_FILES, THINGS_FILE, ITEMS_UNUSED_FILE, THINGS_UNUSED_FILE files in knx2 format.
+        '''
+        self.write_item_files()
+        self.write_unused_files()
+        self.write_thing_files()
+        self.commit_files()
+
+    def write_unused_files(self):
+        '''Writes left over KNXItems to ITEMS_UNUSED_FILE and ITEMS_UNUSED_CONTROLS_FILE.
+        '''
+        config = self.config
+
+        # print left over KNXItems to ITEMS_UNUSED_FILE
+        devc = None
+        devu = None
+        with self.open_output(config.ITEMS_UNUSED_FILE, config.OUT_ENCODING) as unusedfile, \
+                self.open_output(config.ITEMS_UNUSED_CONTROLS_FILE, config.OUT_ENCODING) as controlfile:
+
+            controlfile.append('// These control switches should be added to get event from wall switches\n')
+
+            unusedfile.append('// These group addresses are available in your ETS '
+                              'but are not configured/used in any of your item files\n')
+
+            for item in self.knx.unused():
+
+                if item.ohItem is None:
+                    file = unusedfile
+                    if devu != item.get_device_name():
+                        devu = item.get_device_name()
+                        file.append('\n')
+                else:
+                    file = controlfile
+                    if devc != item.get_device_name():
+                        devc = item.get_device_name()
+                        file.append('\n')
+
+                file.append(item.get_item_representation() + '\n')
+
+    def write_thing_files(self):
+        '''Writes THINGS_FILE and THINGS_UNUSED_FILE.
+        '''
+        config = self.config
+
+        self.write_thing_file(sorted(filter(lambda x: not x.ignore and (x.is_generic or not x.isControl),
+                                            self.knx.assigned()), key=KNXItem.sort_key),
+                              config.THINGS_FILE)
+
+        comment = '// These things are available in your ETS but are not configured/used in any of your item files\n'
+        self.write_thing_file(self.knx.unused(), config.THINGS_UNUSED_FILE, comment)
+
+    def write_debug_files(self):
+        '''Writes all items read to DEBUG_KNX and DEBUG_OH, if defined.
+        '''
+        try:
+            with self.open_output(self.config.DEBUG_KNX) as file:
+                file.extend(f'{item}\n' for item in self.knx.sorted())
+        except (NameError, AttributeError):
+            pass
+
+        try:
+            with self.open_output(self.config.DEBUG_OH) as file:
+                file.extend(f'{item}\n' for item in sorted(self.oh.items(), key=OpenHABItem.sort_key))
+        except (NameError, AttributeError):
+            pass
+
+    def makedirs(self, directory):
+        '''Creates directory for output files if it does not exist.  Returns True if created.
+        '''
+        if not path.exists(directory) and directory:
+            os.makedirs(directory)
+            return True
+        return False
+
+    @contextmanager
+    def open_output(self, filename, encoding=None):
+        '''Yields a list to append the content of filename to, as strings w/ line endings '\\n'.
+
+        The file is written by a thread of its own once the content is complete, so the next file can be rendered
+        meanwhile, see commit_files().
+        '''
+        lines = []
+        yield lines
+
+        previous = self.pending.pop(filename, None)
+        if previous is not None:
+            # same file written twice, the last one wins
+            self.report(filename, previous.result())
+
+        if self.writer is None:
+            self.writer = ThreadPoolExecutor(max_workers=OUTPUT_THREADS)
+        # independent of the current directory when written
+        self.pending[filename] = self.writer.submit(self.commit_file, path.abspath(filename), lines, encoding)
+
+    def commit_files(self):
+        '''Waits until all output files are written, see open_output().
+        '''
+        try:
+            for filename, future in self.pending.items():
+                self.report(filename, future.result())
+        finally:
+            self.pending.clear()
+            if self.writer is not None:
+                self.writer.shutdown()
+                self.writer = None
+
+    def report(self, filename, written):
+        if written:
+            print(f"written: {filename}")
+        else:
+            self.unchanged.append(filename)
+            print(f"unchanged: {filename}")
+
+    @staticmethod
+    def commit_file(filename, lines, encoding=None):
+        '''Writes lines to filename if they differ from the existing file and returns True, False if unchanged.
+
+        The file is only written if its content changed, so openHAB does not reload unchanged files.  It is
+        replaced atomically, so openHAB never reads a partial file.  A symbolic link is kept, its target is replaced.
+        '''
+        # same result as writing in text mode
+        content = ''.join(lines).replace('\n', os.linesep).encode(encoding or locale.getpreferredencoding(False))
+        filename = path.realpath(filename)
+        try:
+            mode = os.stat(filename).st_mode
+            with open(filename, 'rb') as infile:
+                unchanged = infile.read(len(content) + 1) == content
+        except OSError:
+            mode = None
+            unchanged = False
+
+        if unchanged:
+            return False
+
+        # unique name, several sessions of this process may write the same file
+        handle, tmpfile = tempfile.mkstemp(dir=path.dirname(filename), suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as outfile:
+                outfile.write(content)
+            os.chmod(tmpfile, stat.S_IMODE(mode) if mode is not None else 0o666 & ~UMASK)
+            os.replace(tmpfile, filename)
+        except BaseException:
+            if path.exists(tmpfile):
+                os.remove(tmpfile)
+            raise
+        return True
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+'''Collects time, memory and counters per step of a conversion, see options --stats and --profile.
+
+Disclaimer:
+
+   This file is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+'''
+
+import cProfile
+import json
+import pstats
+import sys
+import time
+import tracemalloc
+from collections import Counter, OrderedDict as od
+from contextlib import contextmanager
+
+
+class Stats:
+    '''Wall and CPU time and peak memory per step, plus counters added by the steps.
+
+    The peak memory is traced by tracemalloc, which slows down python code, so the times are higher than
+    without stats.
+    '''
+
+    def __init__(self, profile=None):
+        '''
+        :param str profile: name of the step to run under cProfile, its stats are written to <profile>.prof
+        '''
+        self.steps = od()
+        self.counters = Counter()
+        self.profile = profile
+
+    @contextmanager
+    def step(self, name):
+        '''Measures the code run within the context as step name.
+        '''
+        profiler = cProfile.Profile() if name == self.profile else None
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        start = tracemalloc.get_traced_memory()[0]
+        if hasattr(tracemalloc, 'reset_peak'):    # python >= 3.9
+            tracemalloc.reset_peak()
+
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        if profiler:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler:
+                profiler.disable()
+            self.steps[name] = {
+                'wall_seconds': time.perf_counter() - wall,
+                'cpu_seconds': time.process_time() - cpu,
+                'peak_kb': max(0, tracemalloc.get_traced_memory()[1] - start) // 1024,
+            }
+            if not tracing:
+                tracemalloc.stop()
+
+            if profiler:
+                filename = f"{name}.prof"
+                profiler.dump_stats(filename)
+                print(f"written: {filename}")
+                pstats.Stats(profiler).sort_stats('cumulative').print_stats(20)
+
+    def as_dict(self):
+        return {
+            'steps': self.steps,
+            'total': {'wall_seconds': sum(x['wall_seconds'] for x in self.steps.values()),
+                      'cpu_seconds': sum(x['cpu_seconds'] for x in self.steps.values()),
+                      'peak_kb': max((x['peak_kb'] for x in self.steps.values()), default=0)},
+            'counters': dict(sorted(self.counters.items())),
+        }
+
+    def write(self, filename):
+        '''Writes stats as JSON to filename, '-' for stderr to keep them apart from the conversion log.
+        '''
+        if filename == '-':
+            json.dump(self.as_dict(), sys.stderr, indent=2)
+            print(file=sys.stderr)
+        else:
+            with open(filename, 'w') as outfile:
+                json.dump(self.as_dict(), outfile, indent=2)
+            print(f"written: {filename}")
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+'''Keeps the KNXItems of a conversion in an SQLite database instead of memory, see config.ITEM_STORE.
+
+Disclaimer:
+
+   This file is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+'''
+
+import heapq
+import sqlite3
+
+from groupaddress import GroupAddress
+from items import KNXItem
+
+SCHEMA = '''
+    DROP TABLE IF EXISTS knx_items;
+    CREATE TABLE knx_items (
+        id INTEGER PRIMARY KEY,
+        sort_index INTEGER NOT NULL,
+        name TEXT,
+        address TEXT,
+        ga INTEGER NOT NULL,
+        device_address TEXT,
+        refid TEXT,
+        device_id TEXT,
+        building TEXT,
+        dpt TEXT,
+        loaded INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX knx_items_ga ON knx_items (ga);
+    CREATE INDEX knx_items_device ON knx_items (device_address, ga);
+'''
+
+# KNXItem fields stored
+COLUMNS = ('name', 'address', 'device_address', 'refid', 'device_id', 'building', 'dpt')
+SELECT = ', '.join(COLUMNS)
+
+# same order as KNXItem.sort_key of items neither loaded nor changed, id keeps the order added for equal items
+ORDER = 'sort_index, name, address, device_address, refid, device_id, building, dpt, id'
+
+
+class SQLiteKNXItems:
+    '''All KNXItems of one conversion, stored in an SQLite database, see KNXItems for the interface.
+
+    The items read from the ETS project files stay in the database as rows.  A row is loaded as KNXItem once it
+    is looked up by group address, i.e. used by an item file, and is kept in memory from then on, since loaded
+    items are changed by the conversion.  All other rows are only read as temporary KNXItems while the debug and
+    unused files are written, so memory depends on the size of the item files, not on the size of the project.
+    '''
+
+    def __init__(self, database, session):
+        '''
+        :param str database: database file, replaced if it exists, or ':memory:'
+        :param ConversionSession session: session the items are created for
+        '''
+        self.session = session
+        self.db = sqlite3.connect(database)
+        self.db.executescript(SCHEMA)
+        self.loaded = {}          # rowid: KNXItem
+        self.rowids = {}          # id(KNXItem): rowid
+        self.device_index = {}    # (device_address, ga): {id(KNXItem): KNXItem, ...} of loaded items
+        self.pending = None       # (rowid, keep) of the row being loaded, see load()
+        self.duplicates = 0       # items rejected by add()
+        self.removed = 0
+        self.count = 0            # rows in knx_items
+
+    def __len__(self):
+        return self.count
+
+    def items(self):
+        '''Returns all items in the order added.  Loads all rows, use assigned(), unused() or sorted() instead.
+        '''
+        for row in self.db.execute(f'SELECT id, {SELECT} FROM knx_items WHERE NOT loaded').fetchall():
+            self.load(row)
+        return [self.loaded[x] for x in sorted(self.loaded)]
+
+    def add_records(self, session, records):
+        '''Adds a row per GARecord, see ets.read_project().
+        '''
+        rows = []
+        for record in records:
+            if record.device_address is None or \
+                    self.device_index.get((record.device_address, GroupAddress.parse(record.address))):
+                # compare w/ loaded items
+                KNXItem(session=session, **record._asdict())
+            else:
+                rows.append(self.row(record.name, record.address, record.device_address, record.refid,
+                                     record.device_id, record.building, None))
+
+        # a duplicate at the same device is not inserted, see KNXItems.add()
+        cursor = self.db.executemany(f'''
+            INSERT INTO knx_items (sort_index, ga, {SELECT})
+            SELECT ?, ?, {', '.join('?' * len(COLUMNS))}
+            WHERE NOT EXISTS (SELECT 1 FROM knx_items WHERE device_address = ?5 AND ga = ?2 AND NOT loaded)
+        ''', rows)
+        self.duplicates += len(rows) - cursor.rowcount
+        self.count += cursor.rowcount
+
+    @staticmethod
+    def row(name, address, device_address, refid, device_id, building, dpt):
+        '''Returns the values of knx_items inserted, see add_records().
+        '''
+        ga = GroupAddress.parse(address)
+        return (ga.sort_index + KNXItem.get_device_sort_index(device_address), int(ga),
+                name, address, device_address, refid, device_id, building, dpt)
+
+    def load(self, row, keep=True):
+        '''Returns KNXItem of row (rowid, *COLUMNS).  A kept item is used instead of its row from now on.
+        '''
+        item = self.loaded.get(row[0])
+        if item is None:
+            self.pending = (row[0], keep)
+            try:
+                item = KNXItem(session=self.session, **dict(zip(COLUMNS, row[1:])))
+            finally:
+                self.pending = None
+        return item
+
+    def add(self, item):
+        '''Add item to all items, unless an equal item exists at the same device.
+        '''
+        if self.pending is not None:
+            # item created by load()
+            rowid, keep = self.pending
+            if keep:
+                self.register(rowid, item)
+                self.db.execute('UPDATE knx_items SET loaded = 1 WHERE id = ?', (rowid,))
+            return
+
+        # isControl may change after add, so compare w/ all items at the same device instead of a fixed key
+        if any(item == x for x in self.by_device(item.device_address, item.ga)):
+            # nop, we accept duplicates in ETS file
+            self.duplicates += 1
+            return
+
+        cursor = self.db.execute(f'''
+            INSERT INTO knx_items (sort_index, ga, {SELECT}, loaded)
+            VALUES (?, ?, {', '.join('?' * len(COLUMNS))}, 1)
+        ''', self.row(item.name, item.address, item.device_address, item.refid, item.device_id, item.building,
+                      item.dpt))
+        self.count += 1
+        self.register(cursor.lastrowid, item)
+
+    def register(self, rowid, item):
+        self.loaded[rowid] = item
+        self.rowids[id(item)] = rowid
+        self.device_index.setdefault((item.device_address, item.ga), {})[id(item)] = item
+
+    def remove(self, item):
+        '''Remove item from all items.
+        '''
+        rowid = self.rowids.pop(id(item))
+        del self.loaded[rowid]
+        del self.device_index[(item.device_address, item.ga)][id(item)]
+        self.db.execute('DELETE FROM knx_items WHERE id = ?', (rowid,))
+        self.count -= 1
+        self.removed += 1
+
+    def select(self, where, *args):
+        '''Returns loaded KNXItems of all rows matching where, in the order added.
+        '''
+        rows = self.db.execute(f'SELECT id, {SELECT} FROM knx_items WHERE {where} ORDER BY id', args).fetchall()
+        return [self.load(x) for x in rows]
+
+    def by_address(self, address):
+        '''Returns all items w/ given group address, either GroupAddress or "a/b/c".
+        '''
+        if isinstance(address, str):
+            address = GroupAddress.parse(address)
+        return self.select('ga = ?', int(address))
+
+    def by_device(self, device_address, address):
+        '''Returns all items w/ given group address, either GroupAddress or "a/b/c", at given device.
+        '''
+        if isinstance(address, str):
+            address = GroupAddress.parse(address)
+        return self.select('device_address = ? AND ga = ?', device_address, int(address))
+
+    def assigned(self):
+        '''Returns all items assigned to an OpenHABItem, in the order added.
+        '''
+        return [self.loaded[x] for x in sorted(self.loaded) if self.loaded[x].ohItem is not None]
+
+    def rows(self):
+        '''Yields temporary KNXItems of all rows not loaded, sorted by KNXItem.sort_key.
+        '''
+        for row in self.db.execute(f'SELECT id, {SELECT} FROM knx_items WHERE NOT loaded ORDER BY {ORDER}'):
+            yield self.load(row, keep=False)
+
+    def unused(self):
+        '''Yields all items neither exported nor ignored, sorted by KNXItem.sort_key.
+        '''
+        loaded = sorted((x for x in self.loaded.values() if not x.exported and not x.ignore), key=KNXItem.sort_key)
+        return heapq.merge(loaded, self.rows(), key=KNXItem.sort_key)
+
+    def sorted(self):
+        '''Yields all items sorted by KNXItem.sort_key.
+        '''
+        return heapq.merge(sorted(self.loaded.values(), key=KNXItem.sort_key), self.rows(), key=KNXItem.sort_key)
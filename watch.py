@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+'''Converts again whenever an input file changes, see option -w and watch().
+
+Disclaimer:
+
+   This file is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+'''
+
+import os
+import sys
+import time
+
+from myargs import load_config
+from session import ConversionSession
+
+# seconds between two checks for changed input files
+WATCH_INTERVAL = 0.5
+
+
+def file_stamp(filename):
+    '''Returns modification time and size of filename, None if it does not exist.
+    '''
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def input_files(config):
+    '''Returns all files read by a conversion w/ config: config file, PROJECTFILES and ITEMS_FILES.
+    '''
+    files = [config.__file__]
+
+    projectfiles = getattr(config, 'PROJECTFILES', None)
+    if projectfiles is not None:
+        files.extend(projectfiles.split())
+
+    items_files = getattr(config, 'ITEMS_FILES', None)
+    if items_files is not None:
+        files.extend(x.strip().strip('\\\r\n').strip() for x in items_files.split(','))
+
+    return files
+
+
+class WatchSession(ConversionSession):
+    '''ConversionSession reading only those PROJECTFILES again which changed since the previous session.
+    '''
+
+    def __init__(self, config, projects):
+        '''
+        :param dict projects: projectfile: (file_stamp(), settings, [GARecord, ...]) of the previous sessions
+        '''
+        super().__init__(config)
+        self.watched = projects
+
+    def project_read(self, projectfile, ets_config):
+        previous = self.watched.get(projectfile)
+        return previous is not None and previous[:2] == (file_stamp(projectfile), ets_config)
+
+    def read_project(self, projectfile, ets_config):
+        stamp = file_stamp(projectfile)
+        previous = self.watched.get(projectfile)
+        if previous is not None and previous[:2] == (stamp, ets_config):
+            print(f"using {projectfile} read before")
+            return previous[2]
+
+        records = self.load_project(projectfile, ets_config)
+        self.watched[projectfile] = (stamp, ets_config, records)
+        return records
+
+
+def watch(config):
+    '''Converts, then converts again each time the config file or any of its input files changes.
+
+    Only changed PROJECTFILES are read again, the item files are always read as they are cheap to parse.
+    Output files are only written if their content changed.  Runs until interrupted by Ctrl-C.
+    '''
+    projects = {}
+    stamps = None
+
+    try:
+        while True:
+            files = input_files(config)
+            current = [file_stamp(x) for x in files]
+            if current == stamps:
+                time.sleep(WATCH_INTERVAL)
+                continue
+
+            if stamps is not None and current[0] != stamps[0]:
+                print(f"reloading {config.__file__}")
+                try:
+                    # import from scratch, reload() would keep settings commented out meanwhile
+                    sys.modules.pop(config.__name__, None)
+                    config = load_config(config.__name__)
+                except (Exception, SystemExit) as err:
+                    print(f"ERROR: {err}")
+                    stamps = current
+                    continue
+                files = input_files(config)
+                current = [file_stamp(x) for x in files]
+
+            # a failed conversion is retried once any input file changes again, e.g. a file saved partially
+            stamps = current
+            start = time.perf_counter()
+            session = WatchSession(config, projects)
+            try:
+                session.run()
+            except SystemExit as err:
+                print(f"ERROR: conversion failed, fix the input files: exit {err.code}")
+            except Exception as err:
+                print(f"ERROR: conversion failed, fix the input files: {type(err).__name__}: {err}")
+            else:
+                print(f"converted in {time.perf_counter() - start:.2f} seconds, "
+                      f"{len(session.unchanged)} files unchanged")
+
+            # forget projects no longer configured
+            for projectfile in set(projects) - set(files):
+                del projects[projectfile]
+
+            print("waiting for changes, Ctrl-C to stop")
+
+    except KeyboardInterrupt:
+        pass